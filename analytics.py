@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+
+from store import to_day
+
+KCAL_PER_KG = 7700
+AVERAGE_WINDOWS = (7, 30)
+PROJECTION_DAYS = 30
+
+
+class _Column:
+    # A growable array: writing past the end doubles the buffer, so extending
+    # by a few days is amortized O(1) however long the history is.
+    def __init__(self, dtype):
+        self.values = np.zeros(64, dtype=dtype)
+
+    def write(self, start, values):
+        needed = start + len(values)
+        if needed > len(self.values):
+            capacity = len(self.values)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.zeros(capacity, dtype=self.values.dtype)
+            grown[:start] = self.values[:start]
+            self.values = grown
+        self.values[start:needed] = values
+
+
+def _runs(ok, consecutive, carry):
+    # Length of the streak of qualifying, calendar-consecutive days ending at
+    # each day; carry is the streak ending on the day before the first one.
+    i = np.arange(len(ok))
+    previous = np.concatenate([[carry > 0], ok[:-1]])
+    starts = ok & (~previous | ~consecutive)
+    last = np.maximum.accumulate(np.where(starts, i, -1))
+    return np.where(ok, np.where(last >= 0, i - last, carry + i) + 1, 0)
+
+
+class Trends:
+    # Rolling averages, net balance, goal streaks and a projection of weight
+    # gained or lost relative to the goals (not of absolute weight) over an
+    # EntryStore's daily totals. Prefix sums of intake and burn make any window
+    # average two lookups, and they, like the per-day streak lengths, are only
+    # extended from the last known day when the rollup grows. Everything is
+    # rebuilt when an earlier day changes (the rollup's rewrites counter
+    # moves); the streaks also when the goals do.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._rewrites = None
+        self._goals = None
+        self._days = _Column(np.int64)
+        self._intake = _Column(np.float64)  # prefix sums: [k] is the total of the first k days
+        self._burned = _Column(np.float64)
+        self._runs = {'intake': _Column(np.int64), 'burned': _Column(np.int64)}
+        self._best = {'intake': _Column(np.int64), 'burned': _Column(np.int64)}
+
+    def update(self, entries, goal_intake, goal_burned):
+        goals = (goal_intake, goal_burned)
+        with self._lock:
+            # Only the last known day (it may have had entries added since) and
+            # the days after it are read, unless an earlier day or the goals
+            # changed; series then holds the days from start on.
+            series = None
+            if self._size and goals == self._goals:
+                last = self._days.values[self._size - 1].astype('datetime64[D]')
+                _, rewrites, tail = entries.daily_series(start=last)
+                if rewrites == self._rewrites and len(tail['date']) and tail['date'][0] == last:
+                    start, series = self._size - 1, tail
+            if series is None:
+                start = 0
+                _, rewrites, series = entries.daily_series()
+            n = start + len(series['date'])
+            if not n:
+                self._size, self._rewrites, self._goals = 0, rewrites, goals
+                return self
+            self._days.write(start, series['date'].astype(np.int64))
+            for prefix, col in ((self._intake, 'calories_intake'), (self._burned, 'calories_burned')):
+                base = prefix.values[start]
+                prefix.write(start, np.concatenate([[base], base + np.cumsum(series[col])]))
+            days = self._days.values[:n]
+            if start:
+                consecutive = np.diff(days[start - 1:]) == 1
+            else:
+                consecutive = np.concatenate([[False], np.diff(days) == 1])
+            for name, ok in (('intake', series['calories_intake'] <= goal_intake),
+                             ('burned', series['calories_burned'] >= goal_burned)):
+                runs = _runs(ok, consecutive, self._runs[name].values[start - 1] if start else 0)
+                self._runs[name].write(start, runs)
+                best = self._best[name].values[start - 1] if start else 0
+                self._best[name].write(start, np.maximum(best, np.maximum.accumulate(runs)))
+            self._size, self._rewrites, self._goals = n, rewrites, goals
+        return self
+
+    def _window(self, days, first, last):
+        # Logged days and intake/burn totals over an inclusive range of days.
+        lo = int(np.searchsorted(days, first, side='left'))
+        hi = int(np.searchsorted(days, last, side='right'))
+        return hi - lo, float(self._intake.values[hi] - self._intake.values[lo]), float(self._burned.values[hi] - self._burned.values[lo])
+
+    def summary(self, today):
+        # Averages are per logged day over the last 7 and 30 calendar days,
+        # None if none were logged. A streak is current while its last day is
+        # today or yesterday, since today may not be logged yet.
+        today = int(to_day(today).astype(np.int64))
+        with self._lock:
+            n = self._size
+            days = self._days.values[:n]
+            goal_intake, goal_burned = self._goals
+            out = {'days': n, 'averages': {}}
+            for window in AVERAGE_WINDOWS:
+                count, intake, burned = self._window(days, today - window + 1, today)
+                out['averages'][window] = None if not count else {
+                    'intake': intake / count, 'burned': burned / count, 'net': (intake - burned) / count}
+            current = n and days[-1] >= today - 1
+            out['streaks'] = {name: {'current': int(self._runs[name].values[n - 1]) if current else 0,
+                                     'best': int(self._best[name].values[n - 1]) if n else 0}
+                              for name in self._runs}
+        # Eating above (or burning below) the goals by the recent daily average
+        # surplus gains weight relative to the plan at KCAL_PER_KG per kg.
+        recent = out['averages'][PROJECTION_DAYS]
+        out['projection'] = None if recent is None else {
+            'surplus': recent['net'] - (goal_intake - goal_burned),
+            'kg': (recent['net'] - (goal_intake - goal_burned)) * PROJECTION_DAYS / KCAL_PER_KG,
+        }
+        return out
@@ -1,12 +1,82 @@
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, dash_table, Input, Output, State, Patch
+from dash.exceptions import PreventUpdate
 import plotly.express as px
-import pandas as pd
-import requests
+import base64
 import datetime
+import io
+import json
+import os
+import re
+import secrets
+import threading
+import weakref
+import collections
+import flask
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from analytics import Trends
+from background import ThreadPoolManager
+from downsample import POINT_BUDGET, UNIT_LABELS, bucket_means, choose_unit, lttb, to_lists, window_start
+from fooddb import FoodDatabase
+from history import select
+from metrics import Registry, Sampler, instrument
+from nutrition import SEARCH_URL, NutritionClient
+from portions import parse_meal, parse_portion, scale_nutrition
+from storage import open_storage
+from transfer import detect_format, export_entries, import_entries
+
+DATA_DIR = os.environ.get('FITLYTICS_DATA_DIR', 'fitlytics_data')
+storage = open_storage(DATA_DIR)
+
+nutrition_client = NutritionClient(os.environ.get('FITLYTICS_OFF_URL', SEARCH_URL), cache_path=os.path.join(DATA_DIR, 'nutrition_cache.json'))
+FOOD_DB = os.environ.get('FITLYTICS_FOOD_DB', os.path.join(DATA_DIR, 'foods.db'))
+food_db = FoodDatabase(FOOD_DB) if os.path.exists(FOOD_DB) else None
+lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='food-lookup')
+# Food lookups and adding an entry run as background callbacks on this pool,
+# so a slow upstream ties up one of its workers rather than a request thread.
+background_manager = ThreadPoolManager(os.path.join(DATA_DIR, 'background.db'),
+                                       max_workers=int(os.environ.get('FITLYTICS_BACKGROUND_WORKERS', 4)))
+BACKGROUND_POLL_MS = 250
+
+SESSION_COOKIE = 'fitlytics_session'
+SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{22,64}$')
 
-stats_history = []
-stats_history.clear()
+FIGURE_CACHE_SIZE = 256
+DASHBOARD_REFRESH_MS = 15000
+DEFAULT_WINDOW = 'all'
+figure_cache = collections.OrderedDict()
+figure_cache_lock = threading.Lock()
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_CACHE_ROWS = 1000000  # store positions (int64) held across all cached orderings
+HISTORY_COLUMNS = [
+    ('date', 'Date', 'datetime'), ('food', 'Food', 'text'), ('calories_intake', 'Calories', 'numeric'),
+    ('protein', 'Protein (g)', 'numeric'), ('fat', 'Fat (g)', 'numeric'), ('carbs', 'Carbs (g)', 'numeric'),
+    ('exercise', 'Exercise', 'text'), ('calories_burned', 'Burned', 'numeric'),
+    ('goal_intake', 'Goal Intake', 'numeric'), ('goal_burned', 'Goal Burned', 'numeric'),
+]
+history_cache = collections.OrderedDict()
+history_cache_rows = 0
+history_cache_lock = threading.Lock()
+trends = weakref.WeakKeyDictionary()
+trends_lock = threading.Lock()
+
+metrics = Registry()
+LOOKUP_SECONDS = metrics.histogram('fitlytics_food_lookup_seconds', 'Time to resolve a food to its nutrition, by where the answer came from.', ['source'])
+FIGURE_SECONDS = metrics.histogram('fitlytics_dashboard_build_seconds', 'Time to build the dashboard figures on a cache miss.', ['window'])
+TRENDS_SECONDS = metrics.histogram('fitlytics_trends_seconds', 'Time to bring the trend analytics up to date and summarize them.')
+HISTORY_SECONDS = metrics.histogram('fitlytics_history_query_seconds', 'Time to filter and sort the history table on a cache miss.')
+CACHE_REQUESTS = metrics.counter('fitlytics_cache_requests_total', 'Lookups in the figure and history caches.', ['cache', 'result'])
+metrics.counter('fitlytics_nutrition_cache_requests_total', 'Lookups in the Open Food Facts response cache.', ['result'],
+                source=lambda: {('hit',): nutrition_client.hits, ('miss',): nutrition_client.misses})
+metrics.gauge('fitlytics_cache_entries', 'Entries held in the in-process caches.', ['cache'],
+              source=lambda: {('figures',): len(figure_cache), ('history',): len(history_cache)})
+metrics.gauge('fitlytics_background_jobs', 'Background callback jobs waiting for or holding a worker.', ['state'],
+              source=lambda: {(state,): count for state, count in background_manager.stats().items()})
+PROFILE_MS = os.environ.get('FITLYTICS_PROFILE_MS')
+sampler = Sampler(float(PROFILE_MS) / 1000).start() if PROFILE_MS else None
 
 PRIMARY = '#1a355b'
 SECONDARY = '#3a6ea5'
@@ -97,22 +167,23 @@ footer_style = {
     'fontFamily': 'Inter, Segoe UI, Arial, sans-serif',
 }
 
-def get_openfoodfacts_nutrition(food_name):
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={food_name}&search_simple=1&action=process&json=1&page_size=1"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return None
-    data = response.json()
-    if not data.get('products'):
-        return None
-    product = data['products'][0]
-    nutriments = product.get('nutriments', {})
-    return {
-        'calories': nutriments.get('energy-kcal_100g', 0),
-        'protein': nutriments.get('proteins_100g', 0),
-        'fat': nutriments.get('fat_100g', 0),
-        'carbs': nutriments.get('carbohydrates_100g', 0)
-    }
+def get_openfoodfacts_nutrition(food_name, progress=None):
+    if food_db is not None:
+        with LOOKUP_SECONDS.time(source='food_db'):
+            result = food_db.lookup(food_name)
+        if result:
+            return result
+    if progress:
+        progress(f'Asking Open Food Facts about {food_name}...')
+    with LOOKUP_SECONDS.time(source='open_food_facts'):
+        return nutrition_client.lookup(food_name)
+
+def lookup_portion(text, progress=None):
+    portion = parse_portion(text)
+    return portion, scale_nutrition(get_openfoodfacts_nutrition(portion.name, progress), portion.grams)
+
+def describe_portion(portion):
+    return f"{portion.name} ({portion.grams:g} g)" if portion.grams is not None else portion.name
 
 def make_dashboard(df, goal_intake, goal_burned):
     fig_intake = px.line(df, x='date', y='calories_intake', markers=True, title='Calories Intake vs. Goal',
@@ -128,140 +199,339 @@ def make_dashboard(df, goal_intake, goal_burned):
                          color_discrete_map={'protein': '#0077b6', 'fat': '#ff8800', 'carbs': '#00b4d8'})
     return fig_intake, fig_burned, fig_macros
 
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+app = dash.Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=background_manager)
 app.title = 'Fitlytics – Modern Fitness Tracker'
+server = app.server
+background_manager.instrument(instrument(app, metrics, sampler), sampler)
 
-app.layout = html.Div([
-    dcc.Location(id='url'),
-    html.Div([
-        html.Span([
-            html.Img(src='https://img.icons8.com/ios-filled/50/1a355b/dumbbell.png', style={'height': '2.1rem', 'verticalAlign': 'middle', 'marginRight': '0.7rem', 'marginTop': '-0.1rem'}),
-            html.Span('Fitlytics', style={'fontWeight': 900, 'fontSize': '2.1rem', 'letterSpacing': '0.04em', 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'verticalAlign': 'middle', 'color': PRIMARY, 'textShadow': '0 2px 8px #e9eef6'}),
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-    ], style={**nav_styles, 'background': f'linear-gradient(90deg, {SECONDARY} 0%, {PRIMARY} 100%)', 'color': 'white', 'justifyContent': 'flex-start', 'gap': '0.5rem', 'marginBottom': 0, 'boxShadow': '0 4px 16px rgba(0,0,0,0.09)'}),
-    html.Div(id='navbar', style={'marginTop': '4.5rem'}),
-    html.Div(id='page-content', style={'padding': '2rem', 'maxWidth': '950px', 'margin': 'auto', 'marginTop': '1.5rem'}),
-    html.Footer('© 2025 Fitlytics. All rights reserved.', style=footer_style)
-], style=app_styles)
+@server.before_request
+def assign_session():
+    session_id = flask.request.cookies.get(SESSION_COOKIE, '')
+    if not SESSION_ID.match(session_id):
+        session_id = secrets.token_urlsafe(24)
+        flask.g.new_session = True
+    flask.g.session_id = session_id
 
-@app.callback(Output('navbar', 'children'), Input('url', 'pathname'))
-def update_navbar(pathname):
-    return html.Div([
-        dcc.Link('Dashboard', href='/', style=nav_link(pathname == '/')),
-        dcc.Link('Tracker', href='/tracker', style=nav_link(pathname == '/tracker')),
-        dcc.Link('About', href='/about', style=nav_link(pathname == '/about')),
-        dcc.Link('Contact', href='/contact', style=nav_link(pathname == '/contact')),
-    ], style={**nav_styles, 'background': 'transparent', 'boxShadow': 'none', 'position': 'static', 'marginBottom': '1.5rem', 'justifyContent': 'center', 'color': PRIMARY})
-
-@app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
-def display_page(pathname):
-    if pathname == '/tracker':
-        return tracker_layout()
-    elif pathname == '/about':
-        return about_layout()
-    elif pathname == '/contact':
-        return contact_layout()
+@server.after_request
+def persist_session(response):
+    if flask.g.get('new_session'):
+        response.set_cookie(SESSION_COOKIE, flask.g.session_id, max_age=60*60*24*365*2, httponly=True, samesite='Lax')
+    return response
+
+def current_session():
+    # Background callbacks run outside the request, where only the cookies
+    # Dash copied into the callback context are left.
+    if flask.has_request_context():
+        return flask.g.session_id
+    session = dash.ctx.cookies.get(SESSION_COOKIE, '')
+    if not SESSION_ID.match(session):
+        raise PreventUpdate
+    return session
+
+def current_entries():
+    return storage.entries(current_session())
+
+
+@app.callback(Output('page-dashboard', 'children'), Input('dashboard-visit', 'data'), prevent_initial_call=True)
+def display_dashboard(visit):
+    # The only page rendered per visit: the navbar's clientside callback
+    # stamps dashboard-visit on opening it, and clears it on leaving, which
+    # drops the graphs and their refresh timer.
+    return dashboard_layout() if visit else []
+
+def window_key(window):
+    # The first day a window shows today, as stored in dashboard-state; a
+    # windowed dashboard moves on at midnight even if no entry was added.
+    start = window_start(window, datetime.date.today())
+    return None if start is None else str(start)
+
+
+def dashboard_figures(entries, window):
+    # Figures are cached per session, window and window start and keyed on the
+    # store version, which every appended row bumps, so an unchanged dashboard
+    # is never rebuilt.
+    start = window_key(window)
+    key = (flask.g.session_id, window, start)
+    with figure_cache_lock:
+        cached = figure_cache.get(key)
+        if cached is not None and cached['version'] == entries.version:
+            figure_cache.move_to_end(key)
+            CACHE_REQUESTS.inc(cache='figures', result='hit')
+            return cached
+    CACHE_REQUESTS.inc(cache='figures', result='miss')
+    with FIGURE_SECONDS.time(window=window):
+        figures = build_dashboard_figures(entries, window, start)
+    with figure_cache_lock:
+        figure_cache[key] = figures
+        figure_cache.move_to_end(key)
+        while len(figure_cache) > FIGURE_CACHE_SIZE:
+            figure_cache.popitem(last=False)
+    return figures
+
+def goals_of(latest):
+    goal_intake = latest['goal_intake'] if latest['goal_intake'] is not None else 2500
+    goal_burned = latest['goal_burned'] if latest['goal_burned'] is not None else 500
+    return goal_intake, goal_burned
+
+def peak(values):
+    return max(values, default=0)
+
+def series_lists(series):
+    return {col: values.astype(str).tolist() if col == 'date' else values.tolist() for col, values in series.items()}
+
+def dashboard_view(series):
+    # At most POINT_BUDGET points per series whatever the history length: the
+    # bars fall back to weekly, monthly or yearly means, the macro lines to LTTB.
+    dates = series['date']
+    unit = choose_unit(dates)
+    bar_dates, bars = bucket_means(dates, {col: series[col] for col in ('calories_intake', 'calories_burned')}, unit)
+    view = {
+        'unit': unit,
+        'exact': unit == 'D',
+        'days': len(dates),
+        'last_day': str(dates[-1]) if len(dates) else None,
+        'bars': {'date': bar_dates.astype(str).tolist(), **{col: values.tolist() for col, values in bars.items()}},
+        'macros': {'date': [], 'value': [], 'variable': []},
+    }
+    for col in ('protein', 'fat', 'carbs'):
+        keep = lttb(dates.astype(np.int64), series[col], POINT_BUDGET)
+        x, y = to_lists(dates[keep], series[col][keep])
+        view['macros']['date'] += x
+        view['macros']['value'] += y
+        view['macros']['variable'] += [col] * len(x)
+    return view
+
+def figure_dict(fig):
+    # plotly serializes numeric columns as base64 typed arrays, which a Patch
+    # can neither index nor extend, so the traces keep plain lists.
+    figure = fig.to_dict()
+    for trace, data in zip(fig.data, figure['data']):
+        data['x'] = np.asarray(trace.x).tolist()
+        data['y'] = np.asarray(trace.y).tolist()
+    return figure
+
+def has_macros(latest):
+    return latest is not None and bool(latest['protein'] or latest['fat'] or latest['carbs'])
+
+def build_pie(latest):
+    if has_macros(latest):
+        fig_pie = px.pie(
+            names=['Protein', 'Fat', 'Carbs'],
+            values=[latest['protein'], latest['fat'], latest['carbs']],
+            color_discrete_sequence=[PRIMARY, ACCENT, SECONDARY],
+            title='Latest Macro Distribution'
+        )
+        fig_pie.update_layout(height=320, margin=dict(l=30, r=30, t=50, b=30), autosize=True)
     else:
-        return dashboard_layout()
+        fig_pie = px.pie(title='Latest Macro Distribution')
+        fig_pie.update_layout(height=320, margin=dict(l=30, r=30, t=50, b=30), autosize=True)
+    return fig_pie.to_dict()
 
-def dashboard_layout():
-    if not stats_history:
-        return html.Div([
-            html.Div([
-                html.H2('Dashboard', style={'color': PRIMARY, 'marginBottom': '0.5rem', 'fontWeight': 900, 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'fontSize': '2.2rem', 'letterSpacing': '0.03em'}),
-                html.Hr(style={'border': f'1.5px solid {ACCENT}', 'margin': '1.2rem 0'}),
-                html.P('No stats to display yet. Add nutrition and exercise data!', style={'color': ACCENT, 'fontWeight': 'bold', 'fontSize': '1.15rem'})
-            ], style=card_style)
-        ])
-    df = pd.DataFrame(stats_history)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
-    goal_intake = df['goal_intake'].iloc[-1] if 'goal_intake' in df and not df.empty else 2500
-    goal_burned = df['goal_burned'].iloc[-1] if 'goal_burned' in df and not df.empty else 500
-    import plotly.express as px
+def build_dashboard_figures(entries, window, start):
+    version, rewrites, series = entries.daily_series(start=start)
+    view = dashboard_view(series)
+    latest = entries.latest()
+    goal_intake, goal_burned = goals_of(latest)
+    suffix = '' if view['unit'] == 'D' else f" ({UNIT_LABELS[view['unit']]})"
+    peaks = {
+        'calories_intake': peak(view['bars']['calories_intake']),
+        'calories_burned': peak(view['bars']['calories_burned']),
+        'macros': peak(view['macros']['value']),
+    }
     fig_intake = px.bar(
-        df, x='date', y='calories_intake',
+        view['bars'], x='date', y='calories_intake',
         color_discrete_sequence=[PRIMARY],
-        title='Calories Intake',
+        title='Calories Intake' + suffix,
         labels={'calories_intake': 'Calories', 'date': 'Date'}
     )
     fig_intake.add_hline(y=goal_intake, line_dash="dash", line_color=ACCENT, annotation_text="Goal Intake", annotation_position="top left")
     fig_intake.update_layout(
-        yaxis_range=[0, max(df['calories_intake'].max(), goal_intake, 1)*1.2],
+        yaxis_range=[0, max(peaks['calories_intake'], goal_intake, 1)*1.2],
         plot_bgcolor=BG,
         height=320,
         margin=dict(l=30, r=30, t=50, b=30),
         autosize=True,
     )
     fig_burned = px.bar(
-        df, x='date', y='calories_burned',
+        view['bars'], x='date', y='calories_burned',
         color_discrete_sequence=[SECONDARY],
-        title='Calories Burned',
+        title='Calories Burned' + suffix,
         labels={'calories_burned': 'Calories', 'date': 'Date'}
     )
     fig_burned.add_hline(y=goal_burned, line_dash="dash", line_color=ACCENT, annotation_text="Goal Burned", annotation_position="top left")
     fig_burned.update_layout(
-        yaxis_range=[0, max(df['calories_burned'].max(), goal_burned, 1)*1.2],
+        yaxis_range=[0, max(peaks['calories_burned'], goal_burned, 1)*1.2],
         plot_bgcolor=BG,
         height=320,
         margin=dict(l=30, r=30, t=50, b=30),
         autosize=True,
     )
     fig_macros = px.line(
-        df, x='date', y=['protein', 'fat', 'carbs'],
+        view['macros'], x='date', y='value', color='variable',
         markers=True,
         title='Macros Over Time',
         labels={'value': 'Grams', 'date': 'Date', 'variable': 'Macro'},
         color_discrete_map={'protein': PRIMARY, 'fat': ACCENT, 'carbs': SECONDARY}
     )
     fig_macros.update_layout(
-        yaxis_range=[0, max(df[['protein','fat','carbs']].max().max(), 1)*1.2],
+        yaxis_range=[0, max(peaks['macros'], 1)*1.2],
         plot_bgcolor=BG,
         height=320,
         margin=dict(l=30, r=30, t=50, b=30),
         autosize=True,
     )
-    latest = df.iloc[-1] if not df.empty else None
-    if latest is not None and (latest['protein'] or latest['fat'] or latest['carbs']):
-        fig_pie = px.pie(
-            names=['Protein', 'Fat', 'Carbs'],
-            values=[latest['protein'], latest['fat'], latest['carbs']],
-            color_discrete_sequence=[PRIMARY, ACCENT, SECONDARY],
-            title='Latest Macro Distribution'
-        )
-        fig_pie.update_layout(height=320, margin=dict(l=30, r=30, t=50, b=30), autosize=True)
-    else:
-        fig_pie = px.pie(title='Latest Macro Distribution')
-        fig_pie.update_layout(height=320, margin=dict(l=30, r=30, t=50, b=30), autosize=True)
-    graph_card = lambda title, fig: html.Div([
+    return {
+        'version': version,
+        'state': {'version': version, 'rewrites': rewrites, 'window': window, 'start': start,
+                  'exact': view['exact'], 'days': view['days'], 'last_day': view['last_day'],
+                  'goals': [goal_intake, goal_burned],
+                  'peaks': peaks, 'pie': has_macros(latest)},
+        'goal_intake': goal_intake,
+        'goal_burned': goal_burned,
+        'intake': figure_dict(fig_intake),
+        'burned': figure_dict(fig_burned),
+        'macros': figure_dict(fig_macros),
+        'pie': build_pie(latest),
+        'trends': trend_cards(entry_trends(entries, goal_intake, goal_burned)),
+    }
+
+def entry_trends(entries, goal_intake, goal_burned):
+    # One Trends per entry store, brought up to date from the last day it saw.
+    with trends_lock:
+        tracker = trends.get(entries)
+        if tracker is None:
+            tracker = trends[entries] = Trends()
+    with TRENDS_SECONDS.time():
+        return tracker.update(entries, goal_intake, goal_burned).summary(datetime.date.today())
+
+def stat_card(title, value, detail):
+    return html.Div([
+        html.Div(title, style={'color': PRIMARY, 'fontWeight': 'bold', 'fontSize': '1.05rem'}),
+        html.Div(value, style={'color': ACCENT, 'fontSize': '1.2rem', 'fontWeight': 700}),
+        html.Div(detail, style={'color': DARK, 'fontSize': '0.9rem', 'opacity': 0.75}),
+    ], style={'background': LIGHT, 'borderRadius': '0.8rem', 'padding': '0.8rem', 'textAlign': 'center', 'boxShadow': '0 2px 8px rgba(0,119,182,0.07)'})
+
+def days_text(count):
+    return f"{count} day{'s' if count != 1 else ''}"
+
+def trend_cards(summary):
+    week, month = summary['averages'][7], summary['averages'][30]
+    average = lambda window, key: '–' if window is None else f"{window[key]:,.0f} kcal"
+    streaks, projection = summary['streaks'], summary['projection']
+    return [
+        stat_card('Avg Intake', average(week, 'intake'), f"7-day average · {average(month, 'intake')} over 30 days"),
+        stat_card('Net Balance', average(week, 'net'), f"intake minus burned a day · {average(month, 'net')} over 30 days"),
+        stat_card('Intake Streak', days_text(streaks['intake']['current']), f"at or under goal · best {days_text(streaks['intake']['best'])}"),
+        stat_card('Burn Streak', days_text(streaks['burned']['current']), f"meeting the burn goal · best {days_text(streaks['burned']['best'])}"),
+        stat_card('Weight vs. Plan',
+                  '–' if projection is None else f"{projection['kg']:+.1f} kg in 30 days",
+                  'log some days to project' if projection is None else f"{projection['surplus']:+,.0f} kcal a day vs. plan"),
+    ]
+
+def dashboard_layout():
+    entries = current_entries()
+    if not entries:
+        return html.Div([
+            html.Div([
+                html.H2('Dashboard', style={'color': PRIMARY, 'marginBottom': '0.5rem', 'fontWeight': 900, 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'fontSize': '2.2rem', 'letterSpacing': '0.03em'}),
+                html.Hr(style={'border': f'1.5px solid {ACCENT}', 'margin': '1.2rem 0'}),
+                html.P('No stats to display yet. Add nutrition and exercise data!', style={'color': ACCENT, 'fontWeight': 'bold', 'fontSize': '1.15rem'})
+            ], style=card_style)
+        ])
+    figures = dashboard_figures(entries, DEFAULT_WINDOW)
+    graph_card = lambda title, graph_id, fig: html.Div([
         html.H4(title, style={'color': DARK, 'fontWeight': 700, 'marginBottom': '0.7rem', 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'fontSize': '1.18rem', 'letterSpacing': '0.01em'}),
-        dcc.Graph(figure=fig, config={'displayModeBar': False, 'responsive': True}, style={'background': CARD, 'borderRadius': '1rem', 'padding': '1rem', 'boxShadow': '0 2px 8px rgba(0,119,182,0.07)', 'height': '370px', 'transition': 'box-shadow 0.2s, transform 0.2s'})
+        dcc.Graph(id=graph_id, figure=fig, config={'displayModeBar': False, 'responsive': True}, style={'background': CARD, 'borderRadius': '1rem', 'padding': '1rem', 'boxShadow': '0 2px 8px rgba(0,119,182,0.07)', 'height': '370px', 'transition': 'box-shadow 0.2s, transform 0.2s'})
     ], style={**card_style, 'marginBottom': '1.5rem', 'transition': 'box-shadow 0.2s, transform 0.2s'})
     return html.Div([
+        dcc.Store(id='dashboard-state', data=figures['state']),
+        dcc.Interval(id='dashboard-refresh', interval=DASHBOARD_REFRESH_MS),
         html.Div([
             html.H2('Dashboard', style={'color': PRIMARY, 'marginBottom': '0.5rem', 'fontWeight': 900, 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'fontSize': '2.2rem', 'letterSpacing': '0.03em'}),
             html.Hr(style={'border': f'1.5px solid {ACCENT}', 'margin': '1.2rem 0'}),
             html.Div([
                 html.Div([
                     html.Div('Goal Intake', style={'color': PRIMARY, 'fontWeight': 'bold', 'fontSize': '1.1rem'}),
-                    html.Div(f"{goal_intake} kcal", style={'color': ACCENT, 'fontSize': '1.2rem', 'fontWeight': 700})
+                    html.Div(f"{figures['goal_intake']} kcal", id='goal-intake-value', style={'color': ACCENT, 'fontSize': '1.2rem', 'fontWeight': 700})
                 ], style={'flex': 1, 'textAlign': 'center'}),
                 html.Div([
                     html.Div('Goal Burned', style={'color': PRIMARY, 'fontWeight': 'bold', 'fontSize': '1.1rem'}),
-                    html.Div(f"{goal_burned} kcal", style={'color': ACCENT, 'fontSize': '1.2rem', 'fontWeight': 700})
+                    html.Div(f"{figures['goal_burned']} kcal", id='goal-burned-value', style={'color': ACCENT, 'fontSize': '1.2rem', 'fontWeight': 700})
                 ], style={'flex': 1, 'textAlign': 'center'}),
             ], style={'display': 'flex', 'gap': '2rem', 'marginBottom': '1.5rem', 'justifyContent': 'center'}),
+            html.Div(figures['trends'], id='trend-cards', style={'display': 'grid', 'gridTemplateColumns': 'repeat(auto-fit, minmax(160px, 1fr))', 'gap': '1rem', 'marginBottom': '1.5rem'}),
+            dcc.RadioItems(
+                id='dashboard-window',
+                options=[{'label': label, 'value': value} for label, value in (('7 days', '7d'), ('30 days', '30d'), ('1 year', '1y'), ('All', 'all'))],
+                value=DEFAULT_WINDOW,
+                inline=True,
+                style={'textAlign': 'center', 'color': PRIMARY, 'fontWeight': 'bold'},
+                inputStyle={'marginLeft': '1rem', 'marginRight': '0.35rem', 'accentColor': ACCENT}
+            ),
             html.Div([
-                graph_card('Calories Intake', fig_intake),
-                graph_card('Calories Burned', fig_burned),
-                graph_card('Macros Over Time', fig_macros),
-                graph_card('Latest Macro Distribution', fig_pie),
+                graph_card('Calories Intake', 'intake-graph', figures['intake']),
+                graph_card('Calories Burned', 'burned-graph', figures['burned']),
+                graph_card('Macros Over Time', 'macros-graph', figures['macros']),
+                graph_card('Latest Macro Distribution', 'pie-graph', figures['pie']),
             ], style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '2rem', 'alignItems': 'stretch', 'marginTop': '1.5rem', 'marginBottom': '1.5rem', 'width': '100%', 'maxWidth': '100vw', 'overflowX': 'auto', 'gridTemplateRows': 'auto'}),
         ], style=card_style)
     ])
 
+@app.callback(
+    [Output('intake-graph', 'figure'), Output('burned-graph', 'figure'), Output('macros-graph', 'figure'), Output('pie-graph', 'figure'),
+     Output('goal-intake-value', 'children'), Output('goal-burned-value', 'children'), Output('trend-cards', 'children'),
+     Output('dashboard-state', 'data')],
+    [Input('dashboard-refresh', 'n_intervals'), Input('dashboard-window', 'value')],
+    [State('dashboard-state', 'data')],
+    prevent_initial_call=True
+)
+def refresh_dashboard(n_intervals, window, state):
+    entries = current_entries()
+    if not state:
+        raise PreventUpdate
+    # A new window, or the same window moved on by a day, is rebuilt in full.
+    window_changed = dash.ctx.triggered_id == 'dashboard-window' or state.get('start') != window_key(window)
+    if (entries.version == state['version'] and not window_changed):
+        raise PreventUpdate
+    latest = entries.latest()
+    goal_intake, goal_burned = goals_of(latest)
+    tail = None
+    if not window_changed and state['exact'] and state['last_day'] and [goal_intake, goal_burned] == state['goals']:
+        _, rewrites, tail = entries.daily_series(start=state['last_day'])
+        tail = series_lists(tail)
+        if rewrites != state['rewrites'] or not tail['date'] or tail['date'][0] != state['last_day'] or state['days'] + len(tail['date']) - 1 > POINT_BUDGET:
+            tail = None
+    if tail is None:
+        figures = dashboard_figures(entries, window)
+        return (figures['intake'], figures['burned'], figures['macros'], figures['pie'],
+                f"{goal_intake} kcal", f"{goal_burned} kcal", figures['trends'], figures['state'])
+    # A daily, unreduced view: only the last plotted day can have changed and
+    # everything after it is new, so send those points as in-place patches
+    # instead of whole figures.
+    last = state['days'] - 1
+    peaks = dict(state['peaks'])
+    patches = []
+    for traces, key, goal in ((('calories_intake',), 'calories_intake', goal_intake),
+                              (('calories_burned',), 'calories_burned', goal_burned),
+                              (('protein', 'fat', 'carbs'), 'macros', 1)):
+        patch = Patch()
+        for i, col in enumerate(traces):
+            patch['data'][i]['y'][last] = tail[col][0]
+            patch['data'][i]['x'].extend(tail['date'][1:])
+            patch['data'][i]['y'].extend(tail[col][1:])
+            peaks[key] = max(peaks[key], peak(tail[col]))
+        patch['layout']['yaxis']['range'] = [0, max(peaks[key], goal, 1)*1.2]
+        patches.append(patch)
+    if has_macros(latest) and state.get('pie'):
+        pie = Patch()
+        pie['data'][0]['values'] = [latest['protein'], latest['fat'], latest['carbs']]
+    else:
+        pie = build_pie(latest)
+    state = dict(state, version=entries.version, days=last + len(tail['date']), last_day=tail['date'][-1],
+                 peaks=peaks, pie=has_macros(latest))
+    return (*patches, pie, dash.no_update, dash.no_update, trend_cards(entry_trends(entries, goal_intake, goal_burned)), state)
+
 def tracker_layout():
-    today = datetime.date.today()
     return html.Div([
         html.Div([
             html.H2('Tracker', style={'color': PRIMARY, 'marginBottom': '0.5rem'}),
@@ -285,6 +555,13 @@ def tracker_layout():
                     dcc.Input(id='carbs-input', type='number', value=0, style={'width': '90px', 'marginLeft': '0.4rem', 'background': '#e3f2fd', 'border': f'2px solid {PRIMARY}'}),
                 ], style={'marginBottom': '1.2rem', 'display': 'flex', 'flexWrap': 'wrap', 'alignItems': 'center', 'marginTop': '0.7rem'}),
             ], style={'marginBottom': '2rem', 'padding': '1.2rem', 'background': '#fffbe6', 'borderRadius': '1rem', 'boxShadow': '0 2px 8px rgba(255,136,0,0.07)', 'border': f'2px solid {ACCENT}'}),
+            html.Div([
+                html.H4('Add Meal', style={'color': ACCENT, 'marginBottom': '0.7rem'}),
+                html.Label('Paste a whole meal, one item per line or comma separated (e.g. "2 eggs, 150g rice, 1 banana")', style={'color': PRIMARY, 'fontWeight': 'bold', 'display': 'block', 'marginBottom': '0.5rem'}),
+                dcc.Textarea(id='meal-input', value='', style={'width': '100%', 'height': '80px', 'borderRadius': '0.5rem', 'border': f'2px solid {ACCENT}', 'padding': '0.5rem', 'background': '#fffbe6', 'boxSizing': 'border-box'}),
+                html.Button('Add Meal', id='add-meal-btn', n_clicks=0, style={'background': ACCENT, 'color': 'white', 'border': 'none', 'borderRadius': '0.5rem', 'padding': '0.5rem 1rem', 'fontWeight': 'bold', 'marginTop': '0.5rem', 'boxShadow': '0 2px 8px rgba(255,136,0,0.15)'}),
+                html.Div(id='meal-msg', style={'marginTop': '0.5rem', 'color': ACCENT, 'fontWeight': 'bold'}),
+            ], style={'marginBottom': '2rem', 'padding': '1.2rem', 'background': '#fffbe6', 'borderRadius': '1rem', 'boxShadow': '0 2px 8px rgba(255,136,0,0.07)', 'border': f'2px solid {ACCENT}'}),
             html.Div([
                 html.H4('Add Exercise', style={'color': SECONDARY, 'marginBottom': '0.7rem'}),
                 html.Label('Exercise Name', style={'color': PRIMARY, 'marginRight': '0.5rem'}),
@@ -300,8 +577,38 @@ def tracker_layout():
             ], style={'marginBottom': '1.2rem', 'display': 'flex', 'flexWrap': 'wrap', 'alignItems': 'center'}),
             html.Button('Add Entry', id='add-entry-btn', n_clicks=0, style={'background': PRIMARY, 'color': 'white', 'border': 'none', 'borderRadius': '0.5rem', 'padding': '0.7rem 1.5rem', 'fontWeight': 'bold', 'fontSize': '1.1rem', 'marginTop': '0.5rem', 'boxShadow': '0 2px 8px rgba(0,119,182,0.15)'}),
             html.Div(id='tracker-msg', style={'marginTop': '1rem', 'color': SECONDARY, 'fontWeight': 'bold'}),
-            html.H3("Today's Stats", style={'color': ACCENT, 'marginTop': '2rem', 'marginBottom': '1rem', 'textShadow': '0 2px 8px #fffbe6'}),
-            html.Div(id='today-stats', style={'width': '100%', 'overflowX': 'auto', 'padding': 0, 'margin': 0}),
+            html.Div([
+                html.H4('Import / Export History', style={'color': PRIMARY, 'marginBottom': '0.7rem'}),
+                dcc.Loading(
+                    dcc.Upload(
+                        html.Div(['Drop a CSV or Parquet file here, or ', html.A('choose one', style={'color': ACCENT, 'fontWeight': 'bold', 'cursor': 'pointer'})]),
+                        id='import-upload', multiple=False,
+                        style={'padding': '1rem', 'border': f'2px dashed {PRIMARY}', 'borderRadius': '0.5rem', 'textAlign': 'center', 'background': '#f1f8ff', 'color': PRIMARY}
+                    ),
+                    type='circle', color=PRIMARY
+                ),
+                html.Div(id='import-msg', style={'marginTop': '0.5rem', 'color': PRIMARY, 'fontWeight': 'bold'}),
+                html.Div([
+                    html.Button('Export CSV', id='export-csv-btn', n_clicks=0, style={'background': PRIMARY, 'color': 'white', 'border': 'none', 'borderRadius': '0.5rem', 'padding': '0.5rem 1rem', 'fontWeight': 'bold', 'marginRight': '1rem', 'boxShadow': '0 2px 8px rgba(0,119,182,0.15)'}),
+                    html.Button('Export Parquet', id='export-parquet-btn', n_clicks=0, style={'background': PRIMARY, 'color': 'white', 'border': 'none', 'borderRadius': '0.5rem', 'padding': '0.5rem 1rem', 'fontWeight': 'bold', 'boxShadow': '0 2px 8px rgba(0,119,182,0.15)'}),
+                ], style={'marginTop': '1rem'}),
+                html.Div(id='export-msg', style={'marginTop': '0.5rem', 'color': PRIMARY, 'fontWeight': 'bold'}),
+                dcc.Download(id='export-download'),
+            ], style={'marginTop': '2rem', 'padding': '1.2rem', 'background': '#f1f8ff', 'borderRadius': '1rem', 'boxShadow': '0 2px 8px rgba(0,119,182,0.07)', 'border': f'2px solid {PRIMARY}'}),
+            html.H3('History', style={'color': ACCENT, 'marginTop': '2rem', 'marginBottom': '1rem', 'textShadow': '0 2px 8px #fffbe6'}),
+            dcc.Store(id='history-version'),
+            dash_table.DataTable(
+                id='history-table',
+                columns=[{'id': col, 'name': name, 'type': kind} for col, name, kind in HISTORY_COLUMNS],
+                page_action='custom', page_current=0, page_size=HISTORY_PAGE_SIZE,
+                sort_action='custom', sort_mode='multi', sort_by=[],
+                filter_action='custom', filter_query='',
+                virtualization=True, fixed_rows={'headers': True},
+                style_table={'height': '420px', 'overflowY': 'auto', 'borderRadius': '1rem', 'boxShadow': '0 4px 16px rgba(0,119,182,0.10)'},
+                style_header={'background': ACCENT, 'color': 'white', 'fontWeight': 'bold'},
+                style_cell={'padding': '0.5rem', 'fontFamily': 'Segoe UI, Arial, sans-serif', 'minWidth': '80px', 'textAlign': 'left'},
+                style_data_conditional=[{'if': {'row_index': 'odd'}, 'background': '#e0f7fa'}, {'if': {'row_index': 'even'}, 'background': '#fffbe6'}],
+            ),
         ], style=card_style)
     ])
 
@@ -309,14 +616,20 @@ def tracker_layout():
     Output('api-result', 'children'),
     [Input('api-btn', 'n_clicks')],
     [State('food-input', 'value')],
-    prevent_initial_call=True
+    prevent_initial_call=True,
+    background=True,
+    progress=[Output('api-result', 'children')],
+    running=[(Output('api-btn', 'disabled'), True, False)],
+    cancel=[Input('food-input', 'value')],
+    interval=BACKGROUND_POLL_MS
 )
-def lookup_api(n_clicks, food):
+def lookup_api(set_progress, n_clicks, food):
     if n_clicks and food:
+        set_progress(f'Looking up {food}...')
         try:
-            result = get_openfoodfacts_nutrition(food)
+            portion, result = lookup_portion(food, set_progress)
             if result:
-                return f"Found: {result['calories']} kcal, {result['protein']}g protein, {result['fat']}g fat, {result['carbs']}g carbs"
+                return f"Found {describe_portion(portion)}: {result['calories']} kcal, {result['protein']}g protein, {result['fat']}g fat, {result['carbs']}g carbs"
             else:
                 return 'No nutrition info found. Please enter manually.'
         except Exception as e:
@@ -324,23 +637,37 @@ def lookup_api(n_clicks, food):
     return ''
 
 @app.callback(
-    [Output('tracker-msg', 'children'), Output('today-stats', 'children')],
+    [Output('tracker-msg', 'children'), Output('history-version', 'data')],
     [Input('add-entry-btn', 'n_clicks')],
     [State('food-input', 'value'), State('calories-input', 'value'), State('protein-input', 'value'),
      State('fat-input', 'value'), State('carbs-input', 'value'), State('exercise-input', 'value'),
-     State('burned-input', 'value'), State('goal-intake-input', 'value'), State('goal-burned-input', 'value')]
+     State('burned-input', 'value'), State('goal-intake-input', 'value'), State('goal-burned-input', 'value')],
+    prevent_initial_call=True,
+    background=True,
+    progress=[Output('tracker-msg', 'children')],
+    running=[(Output('add-entry-btn', 'disabled'), True, False)],
+    cancel=[Input('food-input', 'value')],
+    interval=BACKGROUND_POLL_MS
 )
-def add_entry(n_clicks, food, calories, protein, fat, carbs, exercise, burned, goal_intake, goal_burned):
+def add_entry(set_progress, n_clicks, food, calories, protein, fat, carbs, exercise, burned, goal_intake, goal_burned):
     today = datetime.date.today()
     if n_clicks:
+        msg = 'Entry added!'
         if food and (not calories or not protein or not fat or not carbs):
-            result = get_openfoodfacts_nutrition(food)
+            set_progress(f'Looking up {food}...')
+            try:
+                result = lookup_portion(food, set_progress)[1]
+            except requests.RequestException:
+                result = None
+                msg = 'Entry added with the values you entered; the nutrition lookup failed.'
             if result:
                 calories = calories or result['calories']
                 protein = protein or result['protein']
                 fat = fat or result['fat']
                 carbs = carbs or result['carbs']
-        stats_history.append({
+        # The last point at which editing the food cancels the entry.
+        set_progress('Saving...')
+        storage.add(current_session(), {
             'date': today,
             'food': food,
             'calories_intake': calories,
@@ -352,30 +679,154 @@ def add_entry(n_clicks, food, calories, protein, fat, carbs, exercise, burned, g
             'goal_intake': goal_intake,
             'goal_burned': goal_burned
         })
-        msg = 'Entry added!'
     else:
         msg = ''
-    today_stats = [s for s in stats_history if s['date'] == today]
-    if today_stats:
-        df = pd.DataFrame(today_stats)
-        table_header = [
-            html.Thead(html.Tr([
-                html.Th(col, style={'background': ACCENT, 'color': 'white', 'padding': '0.7rem', 'fontWeight': 'bold', 'fontSize': '1.08rem', 'borderRadius': '0.4rem', 'boxShadow': '0 2px 8px rgba(255,136,0,0.09)'})
-                for col in df.columns
-            ]))
-        ]
-        table_body = [
-            html.Tbody([
-                html.Tr([
-                    html.Td(df.iloc[i][col], style={'padding': '0.7rem', 'background': '#fffbe6' if i % 2 == 0 else '#e0f7fa', 'borderRadius': '0.3rem', 'fontWeight': 500, 'fontSize': '1.05rem'})
-                    for col in df.columns
-                ]) for i in range(len(df))
-            ])
-        ]
-        table = html.Table(table_header + table_body, style={'width': '100%', 'borderCollapse': 'separate', 'borderSpacing': '0', 'marginTop': '0.5rem', 'boxShadow': '0 4px 16px rgba(0,119,182,0.10)', 'fontFamily': 'Segoe UI, Arial, sans-serif', 'fontSize': '1.08rem', 'borderRadius': '1rem', 'overflow': 'hidden'})
-        return msg, table
+    return msg, current_entries().version
+
+@app.callback(
+    [Output('meal-msg', 'children'), Output('history-version', 'data', allow_duplicate=True)],
+    [Input('add-meal-btn', 'n_clicks')],
+    [State('meal-input', 'value'), State('goal-intake-input', 'value'), State('goal-burned-input', 'value')],
+    prevent_initial_call=True,
+    background=True,
+    progress=[Output('meal-msg', 'children')],
+    running=[(Output('add-meal-btn', 'disabled'), True, False)],
+    cancel=[Input('meal-input', 'value')],
+    interval=BACKGROUND_POLL_MS
+)
+def add_meal(set_progress, n_clicks, meal, goal_intake, goal_burned):
+    portions = parse_meal(meal)
+    if not n_clicks or not portions:
+        return 'Enter at least one food item.', dash.no_update
+    today = datetime.date.today()
+    def resolve(portion):
+        try:
+            return scale_nutrition(get_openfoodfacts_nutrition(portion.name), portion.grams)
+        except Exception:
+            return None
+    # The items are looked up in parallel; this job only waits for them.
+    futures = [lookup_pool.submit(resolve, portion) for portion in portions]
+    try:
+        for done, _ in enumerate(as_completed(futures), 1):
+            set_progress(f'Looked up {done} of {len(portions)} items...')
+    finally:
+        for future in futures:
+            future.cancel()  # the lookups not yet started, once cancelled
+    added, missing = [], []
+    for portion, future in zip(portions, futures):
+        result = future.result()
+        if not result:
+            missing.append(portion.name)
+            continue
+        added.append({
+            'date': today,
+            'food': describe_portion(portion),
+            'calories_intake': result['calories'],
+            'protein': result['protein'],
+            'fat': result['fat'],
+            'carbs': result['carbs'],
+            'exercise': '',
+            'calories_burned': 0,
+            'goal_intake': goal_intake,
+            'goal_burned': goal_burned
+        })
+    # The last point at which editing the meal cancels it.
+    set_progress('Saving...')
+    if added:
+        storage.add_many(current_session(), added)
+    msg = f"Added {len(added)} item{'s' if len(added) != 1 else ''}."
+    if missing:
+        msg += f" No nutrition info found for: {', '.join(missing)}."
+    return msg, current_entries().version
+
+@app.callback(
+    [Output('import-msg', 'children'), Output('history-version', 'data', allow_duplicate=True)],
+    [Input('import-upload', 'contents')],
+    [State('import-upload', 'filename')],
+    prevent_initial_call=True
+)
+def import_history(contents, filename):
+    if not contents:
+        raise PreventUpdate
+    try:
+        data = io.BytesIO(base64.b64decode(contents.split(',', 1)[1]))
+        result = import_entries(storage, flask.g.session_id, data, detect_format(filename))
+    except (ValueError, RuntimeError) as e:
+        return f'Import failed: {e}', dash.no_update
+    msg = f"Imported {result.imported} row{'s' if result.imported != 1 else ''} from {filename}."
+    if result.rejected:
+        msg += f" Skipped {result.rejected}: {', '.join(f'{reason} ({count})' for reason, count in sorted(result.reasons.items()))}."
+    return msg, current_entries().version
+
+@app.callback(
+    [Output('export-download', 'data'), Output('export-msg', 'children')],
+    [Input('export-csv-btn', 'n_clicks'), Input('export-parquet-btn', 'n_clicks')],
+    prevent_initial_call=True
+)
+def export_history(csv_clicks, parquet_clicks):
+    fmt = 'parquet' if dash.ctx.triggered_id == 'export-parquet-btn' else 'csv'
+    entries = current_entries()
+    if not len(entries):
+        return dash.no_update, 'Nothing to export yet.'
+    try:
+        data = io.BytesIO()
+        export_entries(entries, data, fmt)
+    except RuntimeError as e:
+        return dash.no_update, f'Export failed: {e}'
+    return dcc.send_bytes(data.getvalue(), f'fitlytics-{datetime.date.today()}.{fmt}'), ''
+
+def cache_history(key, cached):
+    # Each ordering is as long as the rows it matched, so the cache is bounded
+    # by positions held rather than by keys; the newest one is always kept,
+    # however long, as the page being viewed needs it.
+    global history_cache_rows
+    with history_cache_lock:
+        old = history_cache.pop(key, None)
+        if old is not None:
+            history_cache_rows -= len(old[1])
+        history_cache[key] = cached
+        history_cache_rows += len(cached[1])
+        while history_cache_rows > HISTORY_CACHE_ROWS and len(history_cache) > 1:
+            _, (_, order) = history_cache.popitem(last=False)
+            history_cache_rows -= len(order)
+
+@app.callback(
+    [Output('history-table', 'data'), Output('history-table', 'page_count')],
+    [Input('history-table', 'page_current'), Input('history-table', 'page_size'), Input('history-table', 'sort_by'),
+     Input('history-table', 'filter_query'), Input('history-version', 'data'), Input('tracker-visit', 'data')],
+    prevent_initial_call=True
+)
+def update_history(page_current, page_size, sort_by, filter_query, version, visit):
+    # First runs when the navbar's clientside callback stamps tracker-visit on
+    # the tracker's first opening rather than on every page load. Only the
+    # requested page is sent. The ordering behind it is cached per session,
+    # filter and sort and reused for as long as the store version stays the
+    # same, so paging through a large history is a slice and a take.
+    entries = current_entries()
+    page_size = page_size or HISTORY_PAGE_SIZE
+    key = (flask.g.session_id, filter_query or '', tuple((s['column_id'], s['direction']) for s in sort_by or []))
+    for _ in range(3):
+        with history_cache_lock:
+            cached = history_cache.get(key)
+            if cached is not None and cached[0] == entries.version:
+                history_cache.move_to_end(key)
+                CACHE_REQUESTS.inc(cache='history', result='hit')
+        if cached is None or cached[0] != entries.version:
+            CACHE_REQUESTS.inc(cache='history', result='miss')
+            with HISTORY_SECONDS.time():
+                cached = select(entries, filter_query, sort_by)
+            cache_history(key, cached)
+        order_version, order = cached
+        page_count = max(1, -(-len(order) // page_size))
+        page_current = min(page_current or 0, page_count - 1)
+        rows = entries.take(order[page_current * page_size:(page_current + 1) * page_size], order_version)
+        if rows is not None:
+            break
     else:
-        return msg, ''
+        raise PreventUpdate
+    for row in rows:
+        row['date'] = row['date'].isoformat()
+    return rows, page_count
 
 def about_layout():
     return html.Div([
@@ -407,5 +858,54 @@ def contact_layout():
         ], style=card_style)
     ])
 
+# Every page but the dashboard is built once here and stays mounted, so the
+# tracker keeps what was typed into it. Navigating only swaps which page is
+# shown and which link is highlighted, in the browser.
+NAV_PAGES = [('Dashboard', '/', 'dashboard'), ('Tracker', '/tracker', 'tracker'), ('About', '/about', 'about'), ('Contact', '/contact', 'contact')]
+
+app.layout = html.Div([
+    dcc.Location(id='url'),
+    html.Div([
+        html.Span([
+            html.Img(src='https://img.icons8.com/ios-filled/50/1a355b/dumbbell.png', style={'height': '2.1rem', 'verticalAlign': 'middle', 'marginRight': '0.7rem', 'marginTop': '-0.1rem'}),
+            html.Span('Fitlytics', style={'fontWeight': 900, 'fontSize': '2.1rem', 'letterSpacing': '0.04em', 'fontFamily': 'Inter, Segoe UI, Arial, sans-serif', 'verticalAlign': 'middle', 'color': PRIMARY, 'textShadow': '0 2px 8px #e9eef6'}),
+        ], style={'display': 'flex', 'alignItems': 'center'}),
+    ], style={**nav_styles, 'background': f'linear-gradient(90deg, {SECONDARY} 0%, {PRIMARY} 100%)', 'color': 'white', 'justifyContent': 'flex-start', 'gap': '0.5rem', 'marginBottom': 0, 'boxShadow': '0 4px 16px rgba(0,0,0,0.09)'}),
+    html.Div(html.Div([
+        dcc.Link(label, href=href, id=f'nav-{page}', style=nav_link(False)) for label, href, page in NAV_PAGES
+    ], style={**nav_styles, 'background': 'transparent', 'boxShadow': 'none', 'position': 'static', 'marginBottom': '1.5rem', 'justifyContent': 'center', 'color': PRIMARY}),
+        id='navbar', style={'marginTop': '4.5rem'}),
+    dcc.Store(id='dashboard-visit', data=None),
+    dcc.Store(id='tracker-visit', data=None),
+    html.Div([
+        html.Div(id='page-dashboard'),
+        html.Div(tracker_layout(), id='page-tracker', style={'display': 'none'}),
+        html.Div(about_layout(), id='page-about', style={'display': 'none'}),
+        html.Div(contact_layout(), id='page-contact', style={'display': 'none'}),
+    ], id='page-content', style={'padding': '2rem', 'maxWidth': '950px', 'margin': 'auto', 'marginTop': '1.5rem'}),
+    html.Footer('© 2025 Fitlytics. All rights reserved.', style=footer_style)
+], style=app_styles)
+
+app.clientside_callback(
+    """
+    function(pathname, visit, trackerVisit) {
+        var pages = %(pages)s;
+        var page = pages.indexOf(pathname) > 0 ? pathname : '/';
+        var links = pages.map(function (href) { return href === pathname ? %(active)s : %(inactive)s; });
+        var shown = pages.map(function (href) { return {display: href === page ? 'block' : 'none'}; });
+        var dashboard = page === '/' ? Date.now() : (visit == null ? window.dash_clientside.no_update : null);
+        var tracker = page === '/tracker' && trackerVisit == null ? Date.now() : window.dash_clientside.no_update;
+        return links.concat(shown, [dashboard, tracker]);
+    }
+    """ % {'pages': json.dumps([href for _, href, _ in NAV_PAGES]),
+           'active': json.dumps(nav_link(True)), 'inactive': json.dumps(nav_link(False))},
+    [Output(f'nav-{page}', 'style') for _, _, page in NAV_PAGES]
+    + [Output(f'page-{page}', 'style') for _, _, page in NAV_PAGES]
+    + [Output('dashboard-visit', 'data'), Output('tracker-visit', 'data')],
+    Input('url', 'pathname'),
+    State('dashboard-visit', 'data'),
+    State('tracker-visit', 'data')
+)
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,257 @@
+"""Dash background callbacks on a local thread pool.
+
+ThreadPoolManager runs background callback jobs on a bounded
+ThreadPoolExecutor inside the server process, so no broker or separate worker
+processes are needed and jobs share the process's storage. At most
+``max_workers`` jobs run at once per process; the rest wait in the executor's
+queue without holding a request.
+
+Job states, results, progress and the signing secret live in a SQLite
+database (WAL mode) rather than in memory, so under a multi-worker server the
+poll for a job's result, its cancellation and the signature check may all land
+on a different worker than the one running it.
+
+Threads cannot be killed, so cancelling is cooperative: a job still queued is
+dropped, and a running one is flagged so that its result is thrown away and
+its next progress update raises Cancelled, ending the callback there. Jobs and
+results nobody has touched for ``expire`` seconds (the page was closed, or the
+worker running the job died) are dropped.
+
+This hooks into Dash's background callback internals (the callback context
+and set_props proxy), so requirements.txt pins the Dash version it was written
+against.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.background_callback._proxy_set_props import ProxySetProps
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+from dash.exceptions import PreventUpdate
+from plotly.io.json import to_json_plotly
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, future=None):
+        self.future = future
+        self.started = None
+
+
+class ThreadPoolManager(BaseBackgroundCallbackManager):
+    def __init__(self, path, max_workers=4, expire=600):
+        self.path = path
+        self.max_workers = max_workers
+        self.expire = expire
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-callback')
+        self._local = threading.local()
+        self._jobs = {}  # the jobs submitted in this process, for stats()
+        self._lock = threading.Lock()
+        self.seconds = None
+        self.sampler = None
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                state TEXT NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS secrets (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        super().__init__(None)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def build_cache_key(self, fn, args, cache_args_to_ignore, triggered):
+        # Results are never reused, so every submission gets its own slot;
+        # otherwise two sessions sending the same inputs at once would race
+        # for a single result.
+        return f'{super().build_cache_key(fn, args, cache_args_to_ignore, triggered)}-{secrets.token_hex(8)}'
+
+    def _set(self, key, value):
+        self._db().execute('INSERT OR REPLACE INTO results (key, value, updated) VALUES (?, ?, ?)',
+                           (key, to_json_plotly(value), time.time()))
+
+    def _pop(self, key, default=None):
+        row = self._db().execute('DELETE FROM results WHERE key = ? RETURNING value', (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def _finish(self, job, key, value):
+        # Stores the result and marks the job done in one step, unless it was
+        # cancelled meanwhile; job_running never sees a finished job without
+        # its result.
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            if db.execute("UPDATE jobs SET state = 'done', updated = ? WHERE id = ? AND state = 'running'",
+                          (now, job)).rowcount:
+                db.execute('INSERT OR REPLACE INTO results (key, value, updated) VALUES (?, ?, ?)',
+                           (key, to_json_plotly(value), now))
+
+    def _touch(self, job, state=None):
+        # The job's state after recording that it is alive (and moving it to
+        # state, if given and it is not cancelled), or None once it is gone.
+        db = self._db()
+        now = time.time()
+        if state is not None:
+            db.execute("UPDATE jobs SET state = ? WHERE id = ? AND state != 'cancelled'", (state, job))
+        row = db.execute('UPDATE jobs SET updated = ? WHERE id = ? RETURNING state', (now, job)).fetchone()
+        return None if row is None else row[0]
+
+    def _expire(self):
+        cutoff = time.time() - self.expire
+        db = self._db()
+        db.execute('DELETE FROM results WHERE updated < ?', (cutoff,))
+        db.execute('DELETE FROM jobs WHERE updated < ?', (cutoff,))
+
+    def instrument(self, seconds, sampler=None):
+        # Time jobs in the given histogram and profile them with the sampler,
+        # under their callback's name like the requests that start them.
+        self.seconds = seconds
+        self.sampler = sampler
+
+    def make_job_fn(self, fn, progress, key=None):
+        return _make_job_fn(self, fn, progress)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        self._expire()
+        job = self._db().execute("INSERT INTO jobs (state, updated) VALUES ('queued', ?)", (time.time(),)).lastrowid
+        local = Job()
+        with self._lock:
+            self._jobs[job] = local
+        local.future = self.executor.submit(job_fn, job, local, key, args, context)
+
+        def finished(_):
+            with self._lock:
+                self._jobs.pop(job, None)
+
+        local.future.add_done_callback(finished)
+        return job
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        job = int(job)
+        self._db().execute("UPDATE jobs SET state = 'cancelled', updated = ? WHERE id = ? AND state != 'done'",
+                           (time.time(), job))
+        with self._lock:
+            local = self._jobs.get(job)
+        if local is not None:
+            local.future.cancel()
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        # A finished job counts as running until its result is collected, so
+        # the next poll picks it up.
+        if job is None:
+            return False
+        row = self._db().execute('SELECT state FROM jobs WHERE id = ?', (int(job),)).fetchone()
+        return row is not None and row[0] != 'cancelled'
+
+    def get_progress(self, key):
+        return self._pop(self._make_progress_key(key))
+
+    def result_ready(self, key):
+        return self._db().execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+    def get_result(self, key, job):
+        result = self._pop(key, self.UNDEFINED)
+        if result is not self.UNDEFINED:
+            self._pop(self._make_progress_key(key))
+            if job is not None:
+                self._db().execute('DELETE FROM jobs WHERE id = ?', (int(job),))
+        return result
+
+    def get_updated_props(self, key):
+        return self._pop(self._make_set_props_key(key), {})
+
+    def get_or_create_signing_secret(self, generate):
+        db = self._db()
+        db.execute("INSERT OR IGNORE INTO secrets (name, value) VALUES ('signing', ?)", (generate(),))
+        return db.execute("SELECT value FROM secrets WHERE name = 'signing'").fetchone()[0]
+
+    def stats(self):
+        # Jobs of this process waiting for a worker and jobs running, for a
+        # metrics gauge.
+        with self._lock:
+            jobs = list(self._jobs.values())
+        running = sum(job.started is not None for job in jobs)
+        return {'queued': len(jobs) - running, 'running': running}
+
+
+def _make_job_fn(manager, fn, progress):
+    name = getattr(fn, '__name__', 'unknown')
+
+    def job_fn(job, local, key, user_callback_args, context):
+        local.started = time.monotonic()
+        if manager._touch(job, 'running') != 'running':
+            return  # cancelled while queued
+
+        def set_progress(value):
+            if manager._touch(job) != 'running':
+                raise Cancelled()
+            manager._set(manager._make_progress_key(key), list(value) if isinstance(value, (list, tuple)) else [value])
+
+        def set_props(component_id, props):
+            manager._set(manager._make_set_props_key(key), {component_id: props})
+
+        def run():
+            c = AttributeDict(**context)
+            c.ignore_register_page = False
+            c.updated_props = ProxySetProps(set_props)
+            context_value.set(c)
+            maybe_progress = [set_progress] if progress else []
+            started = time.perf_counter()
+            if manager.sampler is not None:
+                manager.sampler.enter(name)
+            try:
+                if isinstance(user_callback_args, dict):
+                    output = fn(*maybe_progress, **user_callback_args)
+                elif isinstance(user_callback_args, (list, tuple)):
+                    output = fn(*maybe_progress, *user_callback_args)
+                else:
+                    output = fn(*maybe_progress, user_callback_args)
+            except Cancelled:
+                return
+            except PreventUpdate:
+                output = {'_dash_no_update': '_dash_no_update'}
+            except Exception as err:
+                output = {'background_callback_error': {'msg': str(err), 'tb': traceback.format_exc()}}
+            finally:
+                if manager.sampler is not None:
+                    manager.sampler.exit()
+                if manager.seconds is not None:
+                    manager.seconds.observe(time.perf_counter() - started, callback=name)
+            manager._finish(job, key, output)
+
+        copy_context().run(run)
+
+    return job_fn
@@ -0,0 +1,395 @@
+"""Benchmarks and a load test for the Dash callbacks.
+
+``run`` seeds synthetic histories of each requested size and times the
+server-side work of the main callbacks (layout rendering, dashboard refresh,
+history paging, adding an entry, food lookup) through Flask's test client,
+recording latency and response size. It then serves the app on a local port
+and drives ``/_dash-update-component`` from concurrent clients. Open Food Facts
+is replaced by a stub HTTP server in the same process, so nothing leaves the
+machine. Results go to a JSON file; ``compare`` diffs two of them and fails on
+regressions.
+
+    python bench.py run --sizes 1000 10000 100000 1000000 --out bench_results.json
+    python bench.py compare old.json bench_results.json
+"""
+import argparse
+import datetime
+import http.server
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from downsample import WINDOWS
+
+PRODUCT = {'products': [{'nutriments': {'energy-kcal_100g': 52, 'proteins_100g': 0.3, 'fat_100g': 0.2, 'carbohydrates_100g': 14}}]}
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    # Answers every search with the same product after a fixed delay.
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+    calls = 0
+
+    def do_GET(self):
+        StubHandler.calls += 1
+        time.sleep(self.latency)
+        body = json.dumps(PRODUCT).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency, handler=StubHandler):
+    handler.latency = latency
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/cgi/search.pl'
+
+
+def synthetic_history(n, per_day=4, max_days=20 * 365, seed=0):
+    # About per_day entries a day ending today, packed denser once that would
+    # reach back further than max_days.
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(datetime.date.today(), 'D')
+    days = min(max(1, n // per_day), max_days)
+    return {
+        'date': np.sort(today - rng.integers(0, days, n)),
+        'food': [f'food {i}' for i in rng.integers(0, 500, n).tolist()],
+        'calories_intake': rng.integers(50, 900, n).astype(np.float64),
+        'protein': rng.random(n) * 40,
+        'fat': rng.random(n) * 30,
+        'carbs': rng.random(n) * 80,
+        'exercise': [None] * n,
+        'calories_burned': rng.integers(0, 200, n).astype(np.float64),
+        'goal_intake': np.full(n, 2500.0),
+        'goal_burned': np.full(n, 500.0),
+    }
+
+
+def request_body(dash_app, name, values, changed=None):
+    # The JSON a browser would post to /_dash-update-component for the
+    # callback function called name; values maps 'id.property' to a value.
+    output, spec = next((key, spec) for key, spec in dash_app.callback_map.items() if spec['callback'].__name__ == name)
+    outputs = []
+    for part in output.strip('.').split('...'):
+        component, prop = part.split('@')[0].rsplit('.', 1)
+        outputs.append({'id': component, 'property': prop})
+    inputs = [dict(item, value=values.get(f"{item['id']}.{item['property']}")) for item in spec['inputs']]
+    state = [dict(item, value=values.get(f"{item['id']}.{item['property']}")) for item in spec['state']]
+    return {
+        'output': output,
+        'outputs': outputs if output.startswith('..') else outputs[0],
+        'inputs': inputs,
+        'state': state,
+        'changedPropIds': changed or [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+    }
+
+
+def page_end_id(html):
+    # The signed per-page token background callback requests must echo.
+    config = re.search(r'<script id="_dash-config" type="application/json">(.*?)</script>', html, re.S)
+    return json.loads(config.group(1))['end_id']
+
+
+def dispatch(post, dash_app, name, values, changed=None, end_id=None, poll=0.005):
+    # Calls a callback as the renderer would; post(params, body) sends one
+    # request. A background callback first answers with signed job handles
+    # and is then polled until the result (or a 204 / error) comes back,
+    # here every few ms rather than the page's interval.
+    body = request_body(dash_app, name, values, changed)
+    params = {'endId': end_id} if end_id else {}
+    response = post(params, body)
+    spec = next(spec for spec in dash_app.callback_map.values() if spec['callback'].__name__ == name)
+    if not spec.get('background') or response.status_code != 200:
+        return response
+    handles = json.loads(response.text)
+    params = dict(params, cacheKey=handles['cacheKey'], job=handles['job'])
+    while True:
+        response = post(params, body)
+        if response.status_code != 200 or 'response' in json.loads(response.text):
+            return response
+        time.sleep(poll)
+
+
+def find_component(node, component_id):
+    if isinstance(node, dict):
+        if node.get('props', {}).get('id') == component_id:
+            return node
+        node = list(node.values())
+    if isinstance(node, list):
+        for child in node:
+            found = find_component(child, component_id)
+            if found:
+                return found
+    return None
+
+
+def summarize(latencies):
+    ms = np.array(latencies) * 1000
+    return {
+        'runs': len(ms),
+        'median_ms': round(float(np.median(ms)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'min_ms': round(float(ms.min()), 3),
+    }
+
+
+class CallbackBench:
+    def __init__(self, app, runs):
+        self.app = app
+        self.runs = runs
+        self.results = []
+
+    def client(self):
+        client = self.app.server.test_client()
+        self.end_id = page_end_id(client.get('/').get_data(as_text=True))
+        return client, client.get_cookie(self.app.SESSION_COOKIE).value
+
+    def post(self, client, name, values, changed=None):
+        return dispatch(lambda params, body: client.post('/_dash-update-component', query_string=params, json=body),
+                        self.app.app, name, values, changed, self.end_id)
+
+    def measure(self, label, entries, call, setup=None):
+        latencies, size = [], 0
+        for i in range(self.runs):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            response = call(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f'{label}: HTTP {response.status_code}')
+            size = len(response.data)
+        result = dict(benchmark=label, entries=entries, payload_bytes=size, **summarize(latencies))
+        self.results.append(result)
+        print(f"{label:<40} {entries:>8} rows {result['median_ms']:>9.2f} ms  {size:>8} B", file=sys.stderr)
+        return response
+
+    def history_size(self, n):
+        client, sid = self.client()
+        started = time.perf_counter()
+        self.app.storage.add_columns(sid, synthetic_history(n))
+        print(f'seeded {n} entries in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+        app = self.app
+
+        def clear(cache):
+            return lambda: cache.clear()
+
+        response = self.measure('display_dashboard (cold)', n, lambda i: self.post(client, 'display_dashboard', {'dashboard-visit.data': 1}),
+                                setup=clear(app.figure_cache))
+        self.measure('display_dashboard (cached)', n, lambda i: self.post(client, 'display_dashboard', {'dashboard-visit.data': 1}))
+        state = find_component(response.get_json(), 'dashboard-state')['props']['data']
+        refresh = {'dashboard-refresh.n_intervals': 1, 'dashboard-window.value': state['window'], 'dashboard-state.data': state}
+        self.measure('refresh_dashboard (unchanged)', n, lambda i: self.post(client, 'refresh_dashboard', refresh))
+        for window in WINDOWS:
+            values = dict(refresh, **{'dashboard-window.value': window})
+            self.measure(f'refresh_dashboard:{window} (cold)', n,
+                         lambda i: self.post(client, 'refresh_dashboard', values, ['dashboard-window.value']),
+                         setup=clear(app.figure_cache))
+        self.measure('layout', n, lambda i: client.get('/_dash-layout'))
+        table = {'history-table.page_current': 0, 'history-table.page_size': app.HISTORY_PAGE_SIZE,
+                 'history-table.sort_by': [], 'history-table.filter_query': ''}
+        self.measure('update_history:page (cached order)', n,
+                     lambda i: self.post(client, 'update_history', dict(table, **{'history-table.page_current': i})))
+        sorted_table = dict(table, **{'history-table.sort_by': [{'column_id': 'calories_intake', 'direction': 'desc'}]})
+        self.measure('update_history:sorted (cold)', n, lambda i: self.post(client, 'update_history', sorted_table),
+                     setup=clear(app.history_cache))
+        filtered = dict(table, **{'history-table.filter_query': '{calories_intake} >= 800 && {food} icontains "food 1"'})
+        self.measure('update_history:filtered (cold)', n, lambda i: self.post(client, 'update_history', filtered),
+                     setup=clear(app.history_cache))
+        entry = {'add-entry-btn.n_clicks': 1, 'food-input.value': 'bench', 'calories-input.value': 100,
+                 'protein-input.value': 1, 'fat-input.value': 1, 'carbs-input.value': 1, 'exercise-input.value': '',
+                 'burned-input.value': 0, 'goal-intake-input.value': 2500, 'goal-burned-input.value': 500}
+        self.measure('add_entry', n, lambda i: self.post(client, 'add_entry', entry))
+
+    def lookups(self):
+        client, _ = self.client()
+        self.measure('lookup_api (upstream)', 0,
+                     lambda i: self.post(client, 'lookup_api', {'api-btn.n_clicks': 1, 'food-input.value': f'{100 + i}g bench food {time.time_ns()}'}))
+        self.post(client, 'lookup_api', {'api-btn.n_clicks': 1, 'food-input.value': '100g bench food'})
+        self.measure('lookup_api (cached)', 0,
+                     lambda i: self.post(client, 'lookup_api', {'api-btn.n_clicks': 1, 'food-input.value': '100g bench food'}))
+
+
+def load_test(app, clients, requests_per_client, entries, foods):
+    # Serves the app on a local port and has each client (its own session,
+    # seeded with a history of the given size) cycle through looking up a
+    # food, adding an entry, opening the dashboard and paging the history.
+    # Food names carry no space before the number ("food7", not "food 7"),
+    # which would parse as seven pieces of "food" and share one cache key.
+    from werkzeug.serving import make_server
+    import requests
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    sessions, end_ids = [], []
+    for _ in range(clients):
+        session = requests.Session()
+        page = session.get(url + '/')
+        page.raise_for_status()
+        end_ids.append(page_end_id(page.text))
+        if entries:
+            app.storage.add_columns(session.cookies[app.SESSION_COOKIE], synthetic_history(entries))
+        sessions.append(session)
+    operations = [
+        ('lookup_api', lambda i: ('lookup_api', {'api-btn.n_clicks': 1, 'food-input.value': f'food{i % foods}'}, None)),
+        ('add_entry', lambda i: ('add_entry', {'add-entry-btn.n_clicks': 1, 'food-input.value': f'food{i % foods}', 'calories-input.value': 100,
+                                               'protein-input.value': 1, 'fat-input.value': 1, 'carbs-input.value': 1,
+                                               'goal-intake-input.value': 2500, 'goal-burned-input.value': 500}, None)),
+        ('display_dashboard', lambda i: ('display_dashboard', {'dashboard-visit.data': i + 1}, None)),
+        ('update_history', lambda i: ('update_history', {'history-table.page_current': i % 20, 'history-table.page_size': app.HISTORY_PAGE_SIZE,
+                                                         'history-table.sort_by': [], 'history-table.filter_query': ''}, None)),
+    ]
+    timings = {name: [] for name, _ in operations}
+    sent = {'bytes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def drive(index):
+        session = sessions[index]
+        for i in range(requests_per_client):
+            label, make = operations[(i + index) % len(operations)]
+            name, values, changed = make(i * clients + index)
+            started = time.perf_counter()
+            try:
+                response = dispatch(lambda params, body: session.post(url + '/_dash-update-component', params=params, json=body, timeout=60),
+                                    app.app, name, values, changed, end_ids[index])
+                ok = response.status_code in (200, 204)
+                size = len(response.content)
+            except requests.RequestException:
+                ok, size = False, 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                timings[label].append(elapsed)
+                sent['bytes'] += size
+                sent['errors'] += not ok
+
+    # Each distinct food not already cached should reach the stub exactly once.
+    looked_up = {operations[0][1](i * clients + index)[1]['food-input.value']
+                 for index in range(clients) for i in range(requests_per_client) if (i + index) % len(operations) == 0}
+    expected_calls = sum(not app.nutrition_client.cached(food) for food in looked_up)
+    stub_calls = StubHandler.calls
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(drive, range(clients)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    total = clients * requests_per_client
+    result = {
+        'clients': clients,
+        'requests': total,
+        'entries_per_client': entries,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1),
+        'errors': sent['errors'],
+        'bytes_received': sent['bytes'],
+        'upstream_calls': StubHandler.calls - stub_calls,
+        'distinct_foods': len(looked_up),
+        'operations': {name: summarize(values) for name, values in timings.items() if values},
+    }
+    print(f"load: {total} requests from {clients} clients in {elapsed:.1f}s, {result['throughput_rps']} req/s, "
+          f"{result['errors']} errors, {result['upstream_calls']} upstream lookups for {len(looked_up)} foods", file=sys.stderr)
+    assert result['errors'] or result['upstream_calls'] == expected_calls, \
+        f"expected {expected_calls} upstream lookups, got {result['upstream_calls']}"
+    return result
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': os.environ.get('FITLYTICS_STORAGE', 'sqlite'),
+    }
+
+
+def run(args):
+    stub, stub_url = start_stub(args.stub_latency)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='fitlytics-bench-')
+    os.environ.update(FITLYTICS_DATA_DIR=data_dir, FITLYTICS_OFF_URL=stub_url,
+                      FITLYTICS_FOOD_DB=os.path.join(data_dir, 'no-food-db'))
+    import app
+
+    bench = CallbackBench(app, args.runs)
+    for n in args.sizes:
+        bench.history_size(n)
+    bench.lookups()
+    report = {'meta': metadata(), 'callbacks': bench.results}
+    if args.clients:
+        report['load'] = load_test(app, args.clients, args.requests, args.load_entries, args.foods)
+    stub.shutdown()
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {args.out}', file=sys.stderr)
+
+
+def compare(args):
+    with open(args.old, encoding='utf-8') as f:
+        old = {(r['benchmark'], r['entries']): r for r in json.load(f)['callbacks']}
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)['callbacks']
+    regressions = 0
+    for result in new:
+        before = old.get((result['benchmark'], result['entries']))
+        if before is None or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = ''
+        if ratio > 1 + args.threshold and result['median_ms'] - before['median_ms'] > args.min_ms:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['benchmark']:<40} {result['entries']:>8} {before['median_ms']:>9.2f} -> {result['median_ms']:>9.2f} ms "
+              f"({ratio:.2f}x){flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark and load-test the Fitlytics Dash callbacks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('run')
+    bench.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='history sizes to seed')
+    bench.add_argument('--runs', type=int, default=5, help='timed runs per benchmark')
+    bench.add_argument('--clients', type=int, default=16, help='concurrent load-test clients, 0 to skip the load test')
+    bench.add_argument('--requests', type=int, default=50, help='requests per load-test client')
+    bench.add_argument('--load-entries', type=int, default=10000, help='history size of each load-test session')
+    bench.add_argument('--foods', type=int, default=40, help='distinct foods looked up during the load test')
+    bench.add_argument('--stub-latency', type=float, default=0.05, help='seconds the stub Open Food Facts server takes per search')
+    bench.add_argument('--data-dir', help='defaults to a fresh temporary directory')
+    bench.add_argument('--out', default='bench_results.json')
+    diff = commands.add_parser('compare')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown of the median')
+    diff.add_argument('--min-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
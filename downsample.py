@@ -0,0 +1,74 @@
+import numpy as np
+
+WINDOWS = {'7d': 7, '30d': 30, '1y': 365, 'all': None}
+POINT_BUDGET = 400
+UNIT_LABELS = {'D': 'daily', 'W': 'weekly average', 'M': 'monthly average', 'Y': 'yearly average'}
+
+
+def window_start(window, today):
+    days = WINDOWS.get(window)
+    if days is None:
+        return None
+    return np.datetime64(today, 'D') - np.timedelta64(days - 1, 'D')
+
+
+def bucket_keys(dates, unit):
+    # Calendar week (starting Monday), month or year of each date, as integers.
+    if unit == 'W':
+        return (dates.astype(np.int64) + 3) // 7
+    return dates.astype(f'datetime64[{unit}]').astype(np.int64)
+
+
+def choose_unit(dates, budget=POINT_BUDGET):
+    # The finest unit whose buckets holding logged days fit the budget. Dates
+    # must be sorted.
+    if len(dates) <= budget:
+        return 'D'
+    for unit in ('W', 'M'):
+        if np.count_nonzero(np.diff(bucket_keys(dates, unit))) < budget:
+            return unit
+    return 'Y'
+
+
+def bucket_means(dates, columns, unit):
+    # Mean of the logged days in each calendar week, month or year, labelled by
+    # the bucket's first day. Dates must be sorted.
+    if unit == 'D' or not len(dates):
+        return dates, columns
+    keys = bucket_keys(dates, unit)
+    if unit == 'W':
+        labels = (keys * 7 - 3).astype('datetime64[D]')
+    else:
+        labels = keys.astype(f'datetime64[{unit}]').astype('datetime64[D]')
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    counts = np.diff(np.append(starts, len(keys)))
+    return labels[starts], {col: np.add.reduceat(values, starts) / counts for col, values in columns.items()}
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, from
+    # each of threshold - 2 equal buckets in between, the point forming the
+    # largest triangle with the previous pick and the next bucket's mean.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def to_lists(dates, values):
+    return dates.astype(str).tolist(), values.tolist()
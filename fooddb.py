@@ -0,0 +1,232 @@
+"""Offline food database built from an Open Food Facts dump.
+
+Products are streamed out of the CSV/TSV or JSONL export (optionally gzipped)
+into a SQLite file holding one row per distinct normalized product name with its
+per-100g macros. The UNIQUE index on the normalized name answers exact and
+prefix lookups; an FTS5 trigram index over the same column answers substring and
+fuzzy ones.
+
+    python fooddb.py import en.openfoodfacts.org.products.csv.gz
+    python fooddb.py search "Apple 100g"
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from nutrition import normalize
+from portions import UNITS
+
+DEFAULT_PATH = os.path.join(os.environ.get('FITLYTICS_DATA_DIR', 'fitlytics_data'), 'foods.db')
+BATCH_SIZE = 10000
+MIN_SIMILARITY = 0.5  # trigram Jaccard score a substring or fuzzy match needs for lookup()
+QUANTITY = re.compile(r'^\d+(?:[.,]\d+)?([a-z]*)$')
+
+
+def is_quantity(token):
+    # A bare number or one with a unit ("100g", "1.5l"), but not a name that
+    # starts with digits ("7up").
+    match = QUANTITY.match(token)
+    return match is not None and (not match.group(1) or match.group(1) in UNITS)
+
+
+def search_key(query):
+    return ' '.join(token for token in normalize(query).split() if not is_quantity(token))
+
+
+def trigrams(text):
+    text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _macros(name, nutriments):
+    if not name:
+        return None
+    calories = _number(nutriments.get('energy-kcal_100g'))
+    if calories is None:
+        energy = _number(nutriments.get('energy_100g'))
+        calories = None if energy is None else round(energy / 4.184, 1)
+    if calories is None:
+        return None
+    key = search_key(name)
+    if not key:
+        return None
+    return (name.strip(), key, calories,
+            _number(nutriments.get('proteins_100g')) or 0,
+            _number(nutriments.get('fat_100g')) or 0,
+            _number(nutriments.get('carbohydrates_100g')) or 0)
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_dump(path):
+    with _open(path) as f:
+        if '.jsonl' in path or '.ndjson' in path:
+            for line in f:
+                try:
+                    product = json.loads(line)
+                except ValueError:
+                    continue
+                row = _macros(product.get('product_name'), product.get('nutriments') or {})
+                if row:
+                    yield row
+            return
+        csv.field_size_limit(sys.maxsize)
+        header = f.readline()
+        delimiter = '\t' if '\t' in header else ','
+        fields = next(csv.reader([header], delimiter=delimiter))
+        for values in csv.reader(f, delimiter=delimiter):
+            product = dict(zip(fields, values))
+            row = _macros(product.get('product_name'), product)
+            if row:
+                yield row
+
+
+def import_dump(path, db_path=DEFAULT_PATH, progress=None):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    db = sqlite3.connect(db_path)
+    db.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=OFF;
+        CREATE TABLE IF NOT EXISTS foods (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            norm TEXT NOT NULL UNIQUE,
+            calories REAL, protein REAL, fat REAL, carbs REAL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS foods_trigram USING fts5(
+            norm, content='foods', content_rowid='id', tokenize='trigram'
+        );
+    """)
+    total = 0
+    batch = []
+    for row in read_dump(path):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            total += _insert(db, batch)
+            batch = []
+            if progress:
+                progress(total)
+    total += _insert(db, batch)
+    db.execute("INSERT INTO foods_trigram(foods_trigram) VALUES ('rebuild')")
+    db.commit()
+    db.execute('PRAGMA optimize')
+    db.close()
+    return total
+
+
+def _insert(db, batch):
+    before = db.total_changes
+    with db:
+        db.executemany('INSERT OR IGNORE INTO foods (name, norm, calories, protein, fat, carbs) VALUES (?, ?, ?, ?, ?, ?)', batch)
+    return db.total_changes - before
+
+
+class FoodDatabase:
+    def __init__(self, path=DEFAULT_PATH, fuzzy_budget=0.05):
+        self.path = path
+        self.fuzzy_budget = fuzzy_budget
+        self._local = threading.local()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            self._local.db = db
+        return db
+
+    def search(self, query, limit=5):
+        # Matches in the first pass that finds any: exact name, name prefix,
+        # substring, then fuzzy. Each carries the pass as 'match' and its
+        # trigram Jaccard similarity to the query as 'score'.
+        key = search_key(query)
+        if not key:
+            return []
+        db = self._db()
+        columns = 'name, norm, calories, protein, fat, carbs'
+        match = 'exact'
+        rows = db.execute(f'SELECT {columns} FROM foods WHERE norm = ?', (key,)).fetchall()
+        if not rows:
+            match = 'prefix'
+            rows = db.execute(f'SELECT {columns} FROM foods WHERE norm > ? AND norm < ? ORDER BY norm LIMIT ?',
+                              (key, key + '\uffff', limit)).fetchall()
+        if not rows and len(key) >= 3:
+            match = 'substring'
+            phrase = '"' + key.replace('"', '""') + '"'
+            rows = db.execute(f'SELECT {columns} FROM foods WHERE id IN '
+                              f'(SELECT rowid FROM foods_trigram WHERE foods_trigram MATCH ? LIMIT ?)',
+                              (phrase, limit * 10)).fetchall()
+        if not rows and len(key) >= 3:
+            match = 'fuzzy'
+            grams = ' OR '.join({'"' + key[i:i + 3].replace('"', '""') + '"' for i in range(len(key) - 2) if ' ' not in key[i:i + 3]})
+            if grams:
+                # Ranking an OR over common trigrams can touch a large share of
+                # the index, so the fuzzy pass gets a time budget and simply
+                # finds nothing when it runs out.
+                deadline = time.perf_counter() + self.fuzzy_budget
+                db.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+                try:
+                    rows = db.execute(f'SELECT {columns} FROM foods WHERE id IN '
+                                      f'(SELECT rowid FROM foods_trigram WHERE foods_trigram MATCH ? ORDER BY rank LIMIT ?)',
+                                      (grams, limit * 10)).fetchall()
+                except sqlite3.OperationalError:
+                    rows = []
+                finally:
+                    db.set_progress_handler(None, 0)
+        wanted = trigrams(key)
+        scored = sorted(((len(wanted & trigrams(row[1])) / len(wanted | trigrams(row[1])), row) for row in rows),
+                        key=lambda item: (-item[0], len(item[1][1])))
+        return [{'name': row[0], 'calories': row[2], 'protein': row[3], 'fat': row[4], 'carbs': row[5],
+                 'match': match, 'score': score} for score, row in scored[:limit]]
+
+    def lookup(self, query):
+        # The best match, unless it is only a substring or fuzzy one that looks
+        # too little like the query ("bread" is not "chicken breast"); then
+        # None, so the caller falls back to the API.
+        matches = self.search(query, limit=1)
+        if not matches:
+            return None
+        match = matches[0]
+        if match['match'] not in ('exact', 'prefix') and match['score'] < MIN_SIMILARITY:
+            return None
+        return {'calories': match['calories'], 'protein': match['protein'], 'fat': match['fat'], 'carbs': match['carbs']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and query the offline Fitlytics food database.')
+    parser.add_argument('--db', default=DEFAULT_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('import').add_argument('dump', help='Open Food Facts CSV/TSV or JSONL export, optionally .gz')
+    search = commands.add_parser('search')
+    search.add_argument('query')
+    args = parser.parse_args(argv)
+    if args.command == 'import':
+        started = time.time()
+        total = import_dump(args.dump, args.db, progress=lambda n: print(f'{n} foods imported', end='\r', file=sys.stderr))
+        print(f'Imported {total} foods into {args.db} in {time.time() - started:.1f}s')
+    else:
+        started = time.perf_counter()
+        for match in FoodDatabase(args.db).search(args.query):
+            print(f"{match['name']}: {match['calories']} kcal, {match['protein']}g protein, {match['fat']}g fat, {match['carbs']}g carbs")
+        print(f'({(time.perf_counter() - started) * 1000:.2f} ms)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
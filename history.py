@@ -0,0 +1,143 @@
+import re
+
+import numpy as np
+
+from store import NUMERIC_COLUMNS, TEXT_COLUMNS
+
+# One term of a DataTable filter_query, e.g. {calories_intake} >= 300,
+# {food} icontains "egg" or {date} datestartswith 2024-05.
+TERM = re.compile(r'^\{([^}]+)\}\s*([si]?)(>=|<=|!=|=|<|>|eq|ne|lt|le|gt|ge|contains|datestartswith)\s+(.*)$')
+OPERATORS = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+
+def _unquote(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+        return value[1:-1]
+    return value
+
+
+def parse_filter(query):
+    # (column, operator, case_sensitive, value) for every term this table
+    # understands; anything else is dropped, as the table itself flags it.
+    terms = []
+    for part in (query or '').split(' && '):
+        match = TERM.match(part.strip())
+        if not match:
+            continue
+        column, case, op, value = match.groups()
+        op = OPERATORS.get(op, op)
+        value = _unquote(value)
+        try:
+            if column == 'date':
+                value = np.datetime64(value)
+                if np.datetime_data(value.dtype)[0] not in ('Y', 'M', 'D'):
+                    value = value.astype('datetime64[D]')
+            elif column in NUMERIC_COLUMNS:
+                value = float(value)
+            elif column not in TEXT_COLUMNS:
+                continue
+        except ValueError:
+            continue
+        terms.append((column, op, case != 'i', value))  # as in DataTable, only i ignores case
+    return terms
+
+
+def _date_bounds(terms):
+    # The date terms as one inclusive day range (the indexed part of the
+    # query) plus the days excluded by != terms.
+    start, end, excluded = None, None, []
+    for column, op, _, value in terms:
+        if column != 'date':
+            continue
+        first = value.astype('datetime64[D]')
+        last = (value + 1).astype('datetime64[D]') - 1  # end of the year/month/day given
+        if op in ('eq', 'datestartswith'):
+            low, high = first, last
+        elif op == 'ge':
+            low, high = first, None
+        elif op == 'gt':
+            low, high = last + 1, None
+        elif op == 'le':
+            low, high = None, last
+        elif op == 'lt':
+            low, high = None, first - 1
+        elif op == 'ne':
+            excluded.append((first, last))
+            continue
+        else:
+            continue
+        if low is not None and (start is None or low > start):
+            start = low
+        if high is not None and (end is None or high < end):
+            end = high
+    return start, end, excluded
+
+
+def _compare(values, op, value):
+    if op == 'eq':
+        return values == value
+    if op == 'ne':
+        return values != value
+    if op == 'lt':
+        return values < value
+    if op == 'le':
+        return values <= value
+    if op == 'gt':
+        return values > value
+    if op == 'ge':
+        return values >= value
+    return np.ones(len(values), dtype=bool)
+
+
+def _text_match(values, candidates, op, case_sensitive, value):
+    if not case_sensitive:
+        value = value.lower()
+    out = np.zeros(len(values), dtype=bool)
+    for i in candidates:
+        text = values[i]
+        if text is None:
+            continue
+        if not case_sensitive:
+            text = text.lower()
+        out[i] = value in text if op in ('contains', 'datestartswith') else _compare(text, op, value)
+    return out
+
+
+def _sort_key(values, column, descending):
+    if column in TEXT_COLUMNS:
+        _, codes = np.unique(np.array(['' if v is None else v.lower() for v in values]), return_inverse=True)
+        values = codes.astype(np.float64)
+    elif column == 'date':
+        values = values.astype(np.int64).astype(np.float64)
+    return -values if descending else values  # NaN sorts last either way
+
+
+def select(entries, filter_query=None, sort_by=None):
+    # Store positions of the matching rows in display order (newest first
+    # unless sorted), and the store version they are valid for. Date terms
+    # narrow the scan to a bisected range of the date-ordered store; the rest
+    # are vectorized masks over that range.
+    terms = parse_filter(filter_query)
+    sort_by = [s for s in sort_by or [] if s.get('column_id') == 'date' or s.get('column_id') in NUMERIC_COLUMNS + TEXT_COLUMNS]
+    start, end, excluded = _date_bounds(terms)
+    names = {'date'} | {column for column, *_ in terms} | {s['column_id'] for s in sort_by}
+    if start is not None and end is not None and start > end:
+        return entries.version, np.zeros(0, dtype=np.int64)
+    version, lo, columns = entries.view(start, end, sorted(names))
+    mask = np.ones(len(columns['date']), dtype=bool)
+    for first, last in excluded:
+        mask &= (columns['date'] < first) | (columns['date'] > last)
+    for column, op, _, value in terms:
+        if column in NUMERIC_COLUMNS:
+            mask &= _compare(columns[column], op, value)
+    for column, op, case_sensitive, value in terms:
+        if column in TEXT_COLUMNS:  # per-row, so only over what the masks kept
+            mask &= _text_match(columns[column], np.flatnonzero(mask).tolist(), op, case_sensitive, value)
+    positions = np.flatnonzero(mask)
+    if not sort_by:
+        return version, lo + positions[::-1]
+    keys = [_sort_key(np.asarray(columns[s['column_id']], dtype=object if s['column_id'] in TEXT_COLUMNS else None)[positions],
+                      s['column_id'], s.get('direction') == 'desc')
+            for s in reversed(sort_by)]
+    return version, lo + positions[np.lexsort(keys)]
@@ -0,0 +1,304 @@
+"""Request and callback instrumentation exposed in the Prometheus text format.
+
+A Registry holds counters, gauges and histograms, each optionally labelled, and
+renders them for a /metrics scrape. ``instrument(dash_app, registry)`` hooks
+the Flask server under a Dash app so that every ``/_dash-update-component``
+request is timed and sized per callback, and counts the requests in flight.
+The polls for a background callback's result are sized but not timed; the job
+itself is timed in a histogram of its own, which ``instrument`` returns for the
+background callback manager to record into.
+Finer-grained stages (the food lookup, building figures) are timed by the app
+with the histograms' ``time()`` context manager.
+
+The optional Sampler is a low-overhead sampling profiler: a background thread
+periodically reads the stack of every thread that is currently running a
+callback and counts each distinct stack, giving collapsed-stack output that
+flamegraph.pl or speedscope can render.
+"""
+import collections
+import functools
+import math
+import os
+import sys
+import threading
+import time
+
+import flask
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+CALLBACK_PATH = '/_dash-update-component'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=(), source=None):
+        # source, if given, is called at scrape time and returns either a
+        # number or a dict of label-value tuples to numbers.
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.source = source
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def samples(self):
+        if self.source is not None:
+            values = self.source()
+            values = values if isinstance(values, dict) else {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, key), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{name}{labels} {_number(value)}' for name, labels, value in self.samples()]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def totals(self):
+        # {label tuple: (sum, count)}
+        with self._lock:
+            return {key: (series[1], series[2]) for key, series in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f'{self.name}_bucket', _labels(self.labelnames, key, [('le', _number(bound))]), cumulative
+            yield f'{self.name}_sum', _labels(self.labelnames, key), total
+            yield f'{self.name}_count', _labels(self.labelnames, key), count
+
+
+class _Timer:
+    # Context manager and decorator observing elapsed wall time.
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return timed
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=(), source=None):
+        return self.register(Counter(name, help, labelnames, source))
+
+    def gauge(self, name, help, labelnames=(), source=None):
+        return self.register(Gauge(name, help, labelnames, source))
+
+    def histogram(self, name, help, labelnames=(), buckets=BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+class Sampler:
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.defaultdict(collections.Counter)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def enter(self, name):
+        self._active[threading.get_ident()] = name
+
+    def exit(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, name in active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self.samples[name][self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def collapsed(self, names):
+        # One "callback;outer;...;inner count" line per distinct stack.
+        with self._lock:
+            return '\n'.join(f'{name};{stack} {count}' for name in names
+                             for stack, count in self.samples.get(name, {}).most_common()) + '\n'
+
+
+def instrument(dash_app, registry, sampler=None):
+    server = dash_app.server
+    seconds = registry.histogram('fitlytics_callback_seconds',
+                                 'Wall time of Dash callback requests, including (de)serialization; background callback polls are left out.', ['callback'])
+    job_seconds = registry.histogram('fitlytics_background_job_seconds', 'Run time of background callback jobs.', ['callback'])
+    payload = registry.histogram('fitlytics_callback_response_bytes', 'Size of Dash callback responses.', ['callback'],
+                                 buckets=BYTE_BUCKETS)
+    errors = registry.counter('fitlytics_callback_errors_total', 'Dash callback requests answered with a 5xx status.', ['callback'])
+    in_flight = registry.gauge('fitlytics_callbacks_in_flight', 'Dash callback requests currently being served.', ['callback'])
+
+    def callback_name():
+        body = flask.request.get_json(silent=True) or {}
+        spec = dash_app.callback_map.get(body.get('output'))
+        return getattr(spec and spec.get('callback'), '__name__', 'unknown')
+
+    @server.before_request
+    def start_timer():
+        if flask.request.path.endswith(CALLBACK_PATH):
+            flask.g.metrics_callback = name = callback_name()
+            flask.g.metrics_started = time.perf_counter()
+            flask.g.metrics_poll = 'cacheKey' in flask.request.args  # asking for a background job's result
+            in_flight.inc(callback=name)
+            if sampler is not None:
+                sampler.enter(name)
+
+    @server.after_request
+    def record_response(response):
+        name = flask.g.get('metrics_callback')
+        if name is not None:
+            payload.observe(response.calculate_content_length() or 0, callback=name)
+            if response.status_code >= 500:
+                errors.inc(callback=name)
+        return response
+
+    @server.teardown_request
+    def stop_timer(exc):
+        name = flask.g.get('metrics_callback')
+        if name is not None:
+            if not flask.g.metrics_poll:
+                seconds.observe(time.perf_counter() - flask.g.metrics_started, callback=name)
+            in_flight.dec(callback=name)
+            if sampler is not None:
+                sampler.exit()
+
+    @server.route('/metrics')
+    def metrics():
+        return flask.Response(registry.render(), content_type=CONTENT_TYPE)
+
+    if sampler is not None:
+        @server.route('/metrics/profile')
+        def profile():
+            # Collapsed stacks for ?callback=name (repeatable), or else for the
+            # ?top=N callbacks that have spent the most time in total, in
+            # requests and background jobs together.
+            names = flask.request.args.getlist('callback')
+            if not names:
+                totals = collections.Counter()
+                for histogram in (seconds, job_seconds):
+                    for key, (total, _) in histogram.totals().items():
+                        totals[key] += total
+                ranked = sorted(totals, key=totals.get, reverse=True)
+                names = [key[0] for key in ranked[:flask.request.args.get('top', 3, type=int)]]
+            return flask.Response(sampler.collapsed(names), content_type='text/plain; charset=utf-8')
+
+    return job_seconds
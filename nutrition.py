@@ -0,0 +1,146 @@
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SEARCH_URL = 'https://world.openfoodfacts.org/cgi/search.pl'
+
+
+def normalize(food_name):
+    return ' '.join(food_name.lower().split())
+
+
+def parse_product(product):
+    nutriments = product.get('nutriments', {})
+    return {
+        'calories': nutriments.get('energy-kcal_100g', 0),
+        'protein': nutriments.get('proteins_100g', 0),
+        'fat': nutriments.get('fat_100g', 0),
+        'carbs': nutriments.get('carbohydrates_100g', 0)
+    }
+
+
+class NutritionClient:
+    # Open Food Facts search with a pooled keep-alive session, a bounded LRU
+    # cache whose entries expire after a TTL, and request coalescing: while a
+    # lookup for a name is in flight, identical lookups wait for its result
+    # instead of issuing their own request. The cache is periodically saved to
+    # cache_path so it survives restarts.
+    def __init__(self, search_url=SEARCH_URL, timeout=(3.05, 8), max_entries=2048, ttl=7*24*3600,
+                 miss_ttl=3600, cache_path=None, save_interval=10, pool_size=16):
+        self.search_url = search_url
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.cache_path = cache_path
+        self.save_interval = save_interval
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Fitlytics/1.0'
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.time()
+        if cache_path:
+            self.load()
+            atexit.register(self.save)
+
+    def lookup(self, food_name):
+        key = normalize(food_name)
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = Future()
+        if not leader:
+            return pending.result()
+        try:
+            result = self.fetch(key)
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        self._remember(key, result)
+        pending.set_result(result)
+        return result
+
+    def cached(self, food_name):
+        # Whether a lookup would be answered from the cache right now.
+        with self._lock:
+            cached = self._cache.get(normalize(food_name))
+            return cached is not None and cached[0] > time.time()
+
+    def fetch(self, food_name):
+        response = self.session.get(self.search_url, params={
+            'search_terms': food_name,
+            'search_simple': 1,
+            'action': 'process',
+            'json': 1,
+            'page_size': 1,
+        }, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if not data.get('products'):
+            return None
+        return parse_product(data['products'][0])
+
+    def _remember(self, key, result):
+        expires = time.time() + (self.ttl if result is not None else self.miss_ttl)
+        with self._lock:
+            self._cache[key] = (expires, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._dirty = True
+            due = self.cache_path and time.time() - self._saved_at >= self.save_interval
+        if due:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, (expires, result) in saved.items():
+                if expires > now and key not in self._cache:
+                    self._cache[key] = (expires, result)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {key: list(value) for key, value in self._cache.items()}
+            self._dirty = False
+            self._saved_at = time.time()
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp = f'{self.cache_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.cache_path)
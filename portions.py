@@ -0,0 +1,96 @@
+import re
+from collections import namedtuple
+
+Portion = namedtuple('Portion', ['name', 'quantity', 'unit', 'grams'])
+
+# Grams (or millilitres, taken as grams) per unit.
+UNITS = {
+    'g': 1, 'gram': 1, 'grams': 1, 'gr': 1,
+    'kg': 1000, 'kilo': 1000, 'kilos': 1000,
+    'mg': 0.001,
+    'ml': 1, 'millilitre': 1, 'milliliter': 1, 'millilitres': 1, 'milliliters': 1,
+    'cl': 10, 'dl': 100, 'l': 1000, 'litre': 1000, 'liter': 1000, 'litres': 1000, 'liters': 1000,
+    'oz': 28.35, 'ounce': 28.35, 'ounces': 28.35,
+    'lb': 453.6, 'lbs': 453.6, 'pound': 453.6, 'pounds': 453.6,
+    'cup': 240, 'cups': 240,
+    'tbsp': 15, 'tablespoon': 15, 'tablespoons': 15,
+    'tsp': 5, 'teaspoon': 5, 'teaspoons': 5,
+}
+PIECES = {'piece', 'pieces', 'pc', 'pcs', 'x', 'item', 'items', 'whole', 'slice', 'slices', 'serving', 'servings'}
+
+# Typical edible weight of one piece, used when a quantity has no unit.
+PIECE_GRAMS = {
+    'egg': 50, 'banana': 118, 'apple': 182, 'orange': 131, 'pear': 178, 'peach': 150,
+    'kiwi': 75, 'mandarin': 88, 'tomato': 123, 'potato': 173, 'carrot': 61, 'avocado': 200,
+    'bread': 30, 'toast': 30, 'bagel': 105, 'tortilla': 45, 'muffin': 113, 'cookie': 15,
+    'yogurt': 150, 'bar': 50, 'sausage': 75, 'burger': 150, 'pizza': 107,
+}
+DEFAULT_PIECE_GRAMS = 100
+
+AMOUNT = re.compile(r'(?<![\w.])(\d+\s*/\s*\d+|\d+(?:[.,]\d+)?)\s*([a-z]+\b)?')
+# Commas, semicolons and newlines, but not a decimal comma ("1,5 kg"); "and"
+# is part of too many food names ("mac and cheese") to separate items.
+ITEM_SEPARATORS = re.compile(r'(?:(?<!\d),|,(?!\d)|[;\n])+')
+
+
+def _amount(text):
+    if '/' in text:
+        numerator, denominator = text.split('/')
+        return float(numerator) / float(denominator) if float(denominator) else 0.0
+    return float(text.replace(',', '.'))
+
+
+def singular(word):
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def piece_grams(name):
+    words = [singular(word) for word in name.lower().split()]
+    for word in reversed(words):
+        if word in PIECE_GRAMS:
+            return PIECE_GRAMS[word]
+    return DEFAULT_PIECE_GRAMS
+
+
+def parse_portion(text):
+    text = ' '.join((text or '').split())
+    best = None
+    for match in AMOUNT.finditer(text.lower()):
+        unit = match.group(2)
+        if unit in UNITS:
+            best = match
+            break
+        if best is None and (unit in PIECES or unit is None or match.end(1) < match.start(2)):
+            best = match  # a bare count like "2 eggs", but not the "7" of "7up"
+    if best is None:
+        return Portion(text, None, None, None)
+    quantity = _amount(best.group(1))
+    unit = best.group(2)
+    if unit in UNITS:
+        end, grams = best.end(), quantity * UNITS[unit]
+    else:
+        end = best.end() if unit in PIECES else best.end(1)
+        unit, grams = 'piece', None
+    name = (text[:best.start()] + ' ' + text[end:]).strip()
+    name = re.sub(r'^(of|x)\s+', '', name, flags=re.IGNORECASE).strip() or text
+    if grams is None:
+        grams = quantity * piece_grams(name)
+    return Portion(name, quantity, unit, grams)
+
+
+def parse_meal(text):
+    return [parse_portion(item) for item in ITEM_SEPARATORS.split(text or '') if item.strip()]
+
+
+def scale_nutrition(nutrition, grams):
+    # Nutrition values are per 100 g; a portion without a stated amount keeps them as-is.
+    if nutrition is None or grams is None:
+        return nutrition
+    factor = grams / 100
+    return {key: round((value or 0) * factor, 1) for key, value in nutrition.items()}
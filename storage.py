@@ -0,0 +1,465 @@
+"""On-disk persistence for an EntryStore.
+
+Writes go to an append-only write-ahead log of JSON lines, one per entry, each
+tagged with a sequence number. Every ``compact_every`` records the in-memory
+store is snapshotted into a columnar segment file, which is memory-mapped on
+the next start, so a cold start only replays the log written since then.
+
+Segment layout: an 8-byte magic, an 8-byte little-endian header length, a JSON
+header naming each column's dtype, offset and length, then the raw column
+arrays, each aligned to 64 bytes.
+
+LogStorage is single-process; LogBackend keeps one per user, creating a
+user's directory and log only on their first write and closing the least
+recently used ones beyond ``max_users``. Under a multi-worker server use SQLiteStorage:
+every user's rows live in one shared SQLite database in WAL mode, and each
+worker keeps a cached EntryStore per user that it tops up with the rows other
+workers appended since it last looked.
+"""
+import collections
+import datetime
+import glob
+import json
+import os
+import sqlite3
+import struct
+import threading
+
+import numpy as np
+
+from store import COLUMNS, DAILY_COLUMNS, NUMERIC_COLUMNS, TEXT_COLUMNS, DailyRollup, EntryStore, TextColumn, entry_columns
+
+MAGIC = b'FITSEG1\n'
+ALIGN = 64
+REFRESH_BATCH = 50000
+
+
+class StorageClosed(Exception):
+    pass
+
+
+def write_segment(path, snapshot, seq):
+    arrays = {'date': snapshot['dates'].astype(np.int64)}
+    for col in NUMERIC_COLUMNS:
+        arrays[col] = snapshot['numeric'][col]
+    for col in TEXT_COLUMNS:
+        offsets, data, nulls = snapshot['text'][col]
+        arrays[f'{col}.offsets'] = offsets
+        arrays[f'{col}.data'] = data
+        arrays[f'{col}.nulls'] = nulls
+    arrays['daily.date'] = snapshot['daily']['date'].astype(np.int64)
+    for col in DAILY_COLUMNS:
+        arrays[f'daily.{col}'] = snapshot['daily'][col]
+
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        arrays[name] = values
+        layout[name] = {'dtype': values.dtype.str, 'offset': offset, 'length': len(values)}
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        'seq': seq,
+        'rows': len(snapshot['dates']),
+        'columns': layout,
+    }).encode('utf-8')
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, values in arrays.items():
+            f.seek(start + layout[name]['offset'])
+            f.write(values.tobytes())
+        f.truncate(start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_segment(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a Fitlytics segment file')
+        (size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(size))
+    start = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+
+    def column(name):
+        spec = header['columns'][name]
+        return np.frombuffer(raw, dtype=np.dtype(spec['dtype']), count=spec['length'], offset=start + spec['offset'])
+
+    dates = column('date').view('datetime64[D]')
+    numeric = {col: column(col) for col in NUMERIC_COLUMNS}
+    text = {
+        col: TextColumn(column(f'{col}.offsets'), column(f'{col}.data'), column(f'{col}.nulls'))
+        for col in TEXT_COLUMNS
+    }
+    daily = DailyRollup.restore(
+        column('daily.date').view('datetime64[D]'),
+        {col: column(f'daily.{col}') for col in DAILY_COLUMNS},
+    )
+    return header['seq'], EntryStore.restore(dates, numeric, text, daily)
+
+
+def encode_entry(entry, seq):
+    record = dict(entry, seq=seq)
+    day = record['date']
+    record['date'] = day.isoformat() if hasattr(day, 'isoformat') else str(day)
+    return json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def column_rows(columns):
+    # Row tuples in COLUMNS order (plain Python values, NaN as None) for a
+    # dict of columns as accepted by EntryStore.extend.
+    count = len(columns['date'])
+    values = [np.asarray(columns['date'], dtype='datetime64[D]').astype(str).tolist()]
+    for col in COLUMNS[1:]:
+        column = columns.get(col)
+        if column is None:
+            values.append([None] * count)
+        elif col in NUMERIC_COLUMNS:
+            column = np.asarray(column, dtype=np.float64)
+            values.append(np.where(np.isnan(column), None, column).tolist())
+        else:
+            values.append(list(column))
+    return zip(*values)
+
+
+def decode_entry(line):
+    record = json.loads(line)
+    record['date'] = datetime.date.fromisoformat(record['date'])
+    return record.pop('seq'), record
+
+
+class WriteAheadLog:
+    # Group commit: records are written in sequence order under the caller's
+    # lock, then each writer waits for an fsync that covers its ticket. Whoever
+    # takes the sync lock first flushes and fsyncs for every writer queued
+    # behind it.
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+
+    def write(self, line):
+        with self._lock:
+            self._file.write(line)
+            self._written += 1
+            return self._written
+
+    def sync(self, ticket):
+        with self._sync_lock:
+            if self._synced >= ticket or self._file.closed:
+                return  # already durable, or rotated away by a finished compaction
+            with self._lock:
+                self._file.flush()
+                target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+
+    def close(self):
+        with self._sync_lock, self._lock:
+            if not self._file.closed and self._synced < self._written:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+
+class LogStorage:
+    def __init__(self, root, compact_every=10000):
+        self.root = root
+        self.compact_every = compact_every
+        self.entries = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._segment_seq = 0
+        self._generation = 0
+        self._wal = None
+        self._compacting = False
+        self._compact_lock = threading.Lock()
+        self.closed = False
+
+    @property
+    def segment_path(self):
+        return os.path.join(self.root, 'segment.bin')
+
+    def _wal_path(self, generation):
+        return os.path.join(self.root, f'wal.{generation:08d}.log')
+
+    def _wal_files(self):
+        return sorted(glob.glob(os.path.join(self.root, 'wal.*.log')))
+
+    def open(self):
+        if not os.path.isdir(self.root):
+            self.entries = EntryStore()  # nothing stored yet; see _log
+            return self.entries
+        if os.path.exists(self.segment_path):
+            self._segment_seq, self.entries = read_segment(self.segment_path)
+        else:
+            self.entries = EntryStore()
+        self._seq = self._segment_seq
+        pending = []
+        for path in self._wal_files():
+            self._generation = max(self._generation, int(os.path.basename(path).split('.')[1]))
+            with open(path, 'r+b') as f:
+                good = 0
+                for line in iter(f.readline, b''):
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError
+                        seq, entry = decode_entry(line)
+                    except (ValueError, KeyError):
+                        f.truncate(good)  # torn write at the tail of a crashed log
+                        break
+                    good += len(line)
+                    if seq > self._seq:
+                        pending.append(entry)
+                        self._seq = seq
+                    if len(pending) >= REFRESH_BATCH:
+                        self.entries.extend(entry_columns(pending))
+                        pending = []
+        if pending:
+            self.entries.extend(entry_columns(pending))
+        self._wal = WriteAheadLog(self._wal_path(self._generation))
+        return self.entries
+
+    def _log(self):
+        # The log to append to, with the directory created on the first write.
+        # Called under self._lock.
+        if self.closed:
+            raise StorageClosed(self.root)
+        if self._wal is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._wal = WriteAheadLog(self._wal_path(self._generation))
+        return self._wal
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        with self._lock:
+            wal = self._log()
+            ticket = 0
+            for entry in entries:
+                self._seq += 1
+                ticket = wal.write(encode_entry(entry, self._seq))
+                self.entries.append(entry)
+            due = not self._compacting and self._seq - self._segment_seq >= self.compact_every
+            if due:
+                self._compacting = True
+        wal.sync(ticket)
+        if due:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def add_columns(self, columns):
+        with self._lock:
+            wal = self._log()
+            ticket = 0
+            for row in column_rows(columns):
+                self._seq += 1
+                ticket = wal.write(encode_entry(dict(zip(COLUMNS, row)), self._seq))
+            self.entries.extend(columns)
+            due = not self._compacting and self._seq - self._segment_seq >= self.compact_every
+            if due:
+                self._compacting = True
+        wal.sync(ticket)
+        if due:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        # Switch new writes to a fresh log, snapshot the store as of the switch,
+        # and only then drop the logs the segment now covers. One compaction at
+        # a time: they share the segment's temporary file.
+        with self._compact_lock:
+            with self._lock:
+                if self.closed or self._wal is None:
+                    self._compacting = False
+                    return
+                self._compacting = True
+                seq = self._seq
+                snapshot = self.entries.snapshot()
+                old_wal = self._wal
+                self._generation += 1
+                current = self._wal_path(self._generation)
+                self._wal = WriteAheadLog(current)
+            try:
+                write_segment(self.segment_path, snapshot, seq)
+                old_wal.close()
+                for path in self._wal_files():
+                    if path < current:
+                        os.remove(path)
+                self._segment_seq = seq
+            finally:
+                self._compacting = False
+
+    def close(self):
+        # Waits for a running compaction; later writes raise StorageClosed.
+        with self._compact_lock, self._lock:
+            self.closed = True
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+
+class LogBackend:
+    def __init__(self, root, compact_every=10000, max_users=256):
+        self.root = root
+        self.compact_every = compact_every
+        self.max_users = max_users
+        self._partitions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _partition(self, user):
+        with self._lock:
+            storage = self._partitions.get(user)
+            if storage is None:
+                storage = self._partitions[user] = LogStorage(os.path.join(self.root, user), self.compact_every)
+                storage.open()
+                evicted = []
+                while len(self._partitions) > self.max_users:
+                    evicted.append(self._partitions.popitem(last=False)[1])
+            else:
+                self._partitions.move_to_end(user)
+                evicted = []
+        for old in evicted:
+            old.close()
+        return storage
+
+    def _write(self, user, method, *args):
+        # A writer that picked up a partition just before it was evicted and
+        # closed goes again through the reopened one.
+        while True:
+            try:
+                return getattr(self._partition(user), method)(*args)
+            except StorageClosed:
+                continue
+
+    def entries(self, user):
+        return self._partition(user).entries
+
+    def add(self, user, entry):
+        self._write(user, 'add', entry)
+
+    def add_many(self, user, entries):
+        self._write(user, 'add_many', entries)
+
+    def add_columns(self, user, columns):
+        self._write(user, 'add_columns', columns)
+
+    def close(self):
+        with self._lock:
+            partitions = list(self._partitions.values())
+            self._partitions.clear()
+        for storage in partitions:
+            storage.close()
+
+
+class SQLiteStorage:
+    def __init__(self, path, max_users=256):
+        self.path = path
+        self.max_users = max_users
+        self._local = threading.local()
+        self._partitions = collections.OrderedDict()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT NOT NULL,
+                date TEXT NOT NULL,
+                {', '.join(f'{col} REAL' if col in NUMERIC_COLUMNS else f'{col} TEXT' for col in COLUMNS[1:])}
+            );
+            CREATE INDEX IF NOT EXISTS entries_user_seq ON entries (user, seq);
+        """)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _partition(self, user):
+        with self._lock:
+            partition = self._partitions.get(user)
+            if partition is None:
+                partition = self._partitions[user] = {'entries': EntryStore(), 'seq': 0, 'lock': threading.Lock()}
+                while len(self._partitions) > self.max_users:
+                    self._partitions.popitem(last=False)
+            else:
+                self._partitions.move_to_end(user)
+            return partition
+
+    def _refresh(self, user, partition):
+        # Only this user's rows newer than the last one seen; served from the
+        # (user, seq) index, so an up-to-date partition costs one empty probe.
+        # Rows are fetched and added to the store in column batches.
+        rows = self._db().execute(
+            f'SELECT seq, {", ".join(COLUMNS)} FROM entries WHERE user = ? AND seq > ? ORDER BY seq',
+            (user, partition['seq']),
+        )
+        while True:
+            batch = rows.fetchmany(REFRESH_BATCH)
+            if not batch:
+                break
+            values = list(zip(*batch))
+            columns = {'date': np.array(values[1], dtype='datetime64[D]')}
+            for i, col in enumerate(COLUMNS[1:], 2):
+                if col in NUMERIC_COLUMNS:
+                    columns[col] = np.array(values[i], dtype=np.float64)
+                else:
+                    columns[col] = list(values[i])
+            partition['entries'].extend(columns)
+            partition['seq'] = batch[-1][0]
+
+    def entries(self, user):
+        partition = self._partition(user)
+        with partition['lock']:
+            self._refresh(user, partition)
+        return partition['entries']
+
+    def add(self, user, entry):
+        self.add_many(user, [entry])
+
+    def add_many(self, user, entries):
+        names = ('user',) + COLUMNS
+        rows = []
+        for entry in entries:
+            row = dict(entry, user=user)
+            row['date'] = row['date'].isoformat()
+            rows.append([row.get(name) for name in names])
+        self._insert(user, names, rows)
+
+    def add_columns(self, user, columns):
+        names = ('user',) + COLUMNS
+        self._insert(user, names, ((user,) + row for row in column_rows(columns)))
+
+    def _insert(self, user, names, rows):
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(f'INSERT INTO entries ({", ".join(names)}) VALUES ({", ".join("?" * len(names))})', rows)
+        partition = self._partition(user)
+        with partition['lock']:
+            self._refresh(user, partition)
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def open_storage(data_dir):
+    if os.environ.get('FITLYTICS_STORAGE', 'sqlite') == 'log':
+        return LogBackend(data_dir)
+    return SQLiteStorage(os.path.join(data_dir, 'fitlytics.db'))
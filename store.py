@@ -0,0 +1,422 @@
+import datetime
+import threading
+
+import numpy as np
+
+NUMERIC_COLUMNS = ('calories_intake', 'protein', 'fat', 'carbs', 'calories_burned', 'goal_intake', 'goal_burned')
+TEXT_COLUMNS = ('food', 'exercise')
+COLUMNS = ('date', 'food', 'calories_intake', 'protein', 'fat', 'carbs', 'exercise', 'calories_burned', 'goal_intake', 'goal_burned')
+DAILY_COLUMNS = ('calories_intake', 'calories_burned', 'protein', 'fat', 'carbs')
+
+
+def to_day(value):
+    if isinstance(value, np.datetime64):
+        return value.astype('datetime64[D]')
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+def _number(value):
+    if value is None or value == '':
+        return np.nan
+    return float(value)
+
+
+def entry_columns(entries):
+    # Entry dicts as the column dict EntryStore.extend takes.
+    columns = {'date': np.array([to_day(entry['date']) for entry in entries], dtype='datetime64[D]')}
+    for col in NUMERIC_COLUMNS:
+        columns[col] = np.array([_number(entry.get(col)) for entry in entries], dtype=np.float64)
+    for col in TEXT_COLUMNS:
+        columns[col] = [entry.get(col) for entry in entries]
+    return columns
+
+
+def _plain(value):
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class TextColumn:
+    # A list of optional strings whose prefix may live in a read-only encoded
+    # buffer (offsets into utf-8 data plus a null mask, typically memory-mapped
+    # from a segment file). Values are decoded on access; new values go to a
+    # plain Python tail.
+    def __init__(self, offsets=None, data=None, nulls=None):
+        self._offsets = offsets
+        self._data = data
+        self._nulls = nulls
+        self._base = 0 if offsets is None else len(offsets) - 1
+        self._tail = []
+
+    def __len__(self):
+        return self._base + len(self._tail)
+
+    def _decode(self, i):
+        if self._nulls[i]:
+            return None
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+    def _decode_range(self, lo, hi):
+        blob = bytes(self._data[self._offsets[lo]:self._offsets[hi]])
+        bounds = (self._offsets[lo:hi + 1] - self._offsets[lo]).tolist()
+        nulls = self._nulls[lo:hi].tolist()
+        return [None if null else blob[a:b].decode('utf-8') for a, b, null in zip(bounds, bounds[1:], nulls)]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            split = min(max(start, self._base), stop)
+            head = self._decode_range(start, split) if split > start else []
+            return head + self._tail[split - self._base:stop - self._base]
+        if key < 0:
+            key += len(self)
+        if key < self._base:
+            return self._decode(key)
+        return self._tail[key - self._base]
+
+    def insert(self, pos, value):
+        if pos < self._base:
+            self._tail = [self._decode(i) for i in range(self._base)] + self._tail
+            self._offsets = self._data = self._nulls = None
+            self._base = 0
+        self._tail.insert(pos - self._base, value)
+
+    def extend(self, values):
+        self._tail.extend(values)
+
+    def encode(self, n=None):
+        n = len(self) if n is None else n
+        base = min(n, self._base)
+        head = self._offsets[:base + 1] if base else np.zeros(1, dtype=np.int64)
+        tail = [b'' if v is None else v.encode('utf-8') for v in self._tail[:n - base]]
+        lengths = np.fromiter((len(b) for b in tail), dtype=np.int64, count=len(tail))
+        offsets = np.concatenate([head, head[-1] + np.cumsum(lengths)]).astype(np.int64)
+        data = np.frombuffer(b''.join([bytes(self._data[:head[-1]]) if base else b''] + tail), dtype=np.uint8)
+        nulls = np.concatenate([
+            self._nulls[:base] if base else np.zeros(0, dtype=np.uint8),
+            np.fromiter((v is None for v in self._tail[:n - base]), dtype=np.uint8, count=n - base),
+        ])
+        return offsets, data, nulls
+
+
+class DailyRollup:
+    # Per-day totals. Entries only ever add to a day, so they are maintained in
+    # O(1) per appended row (rows for a new day past the end, the common case)
+    # without revisiting history.
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._days = np.empty(capacity, dtype='datetime64[D]')
+        self._totals = {col: np.zeros(capacity, dtype=np.float64) for col in DAILY_COLUMNS}
+        # Bumped whenever a day other than the last one changes, so readers
+        # holding a copy of the series know they cannot just patch its tail.
+        self.rewrites = 0
+
+    @classmethod
+    def restore(cls, days, totals):
+        rollup = cls(capacity=max(64, len(days)))
+        rollup._size = len(days)
+        rollup._days[:len(days)] = days
+        for col in DAILY_COLUMNS:
+            rollup._totals[col][:len(days)] = totals[col]
+        return rollup
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, extra=1):
+        needed = self._size + extra
+        capacity = len(self._days)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        days = np.empty(capacity, dtype='datetime64[D]')
+        days[:self._size] = self._days[:self._size]
+        self._days = days
+        for col, values in self._totals.items():
+            grown = np.zeros(capacity, dtype=np.float64)
+            grown[:self._size] = values[:self._size]
+            self._totals[col] = grown
+
+    def _slot(self, day):
+        n = self._size
+        if n and self._days[n - 1] == day:
+            return n - 1
+        self._reserve()
+        if not n or day > self._days[n - 1]:
+            pos = n
+        else:
+            pos = int(np.searchsorted(self._days[:n], day))
+            self.rewrites += 1
+            if self._days[pos] == day:
+                return pos
+            self._days[pos + 1:n + 1] = self._days[pos:n]
+            for values in self._totals.values():
+                values[pos + 1:n + 1] = values[pos:n]
+        self._days[pos] = day
+        for values in self._totals.values():
+            values[pos] = 0.0
+        self._size = n + 1
+        return pos
+
+    def add(self, day, entry):
+        i = self._slot(day)
+        for col, values in self._totals.items():
+            amount = _number(entry.get(col))
+            if amount == amount:
+                values[i] += amount
+        return i
+
+    def extend(self, dates, numeric):
+        # Bulk form of add() for date-sorted columns: per-day sums are taken in
+        # one pass, days past the current end are appended as a block and only
+        # days already present go through _slot() one by one.
+        if not len(dates):
+            return
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(dates)) + 1])
+        days = dates[starts]
+        sums = {col: np.add.reduceat(np.nan_to_num(numeric[col]), starts) for col in DAILY_COLUMNS}
+        n = self._size
+        split = int(np.searchsorted(days, self._days[n - 1], side='right')) if n else 0
+        for j in range(split):
+            i = self._slot(days[j])
+            for col, values in self._totals.items():
+                values[i] += sums[col][j]
+        fresh = len(days) - split
+        if fresh:
+            self._reserve(fresh)
+            n = self._size
+            self._days[n:n + fresh] = days[split:]
+            for col, values in self._totals.items():
+                values[n:n + fresh] = sums[col][split:]
+            self._size = n + fresh
+
+    def span(self, start=None, end=None):
+        days = self._days[:self._size]
+        lo = 0 if start is None else int(np.searchsorted(days, to_day(start), side='left'))
+        hi = self._size if end is None else int(np.searchsorted(days, to_day(end), side='right'))
+        return lo, max(lo, hi)
+
+    def series(self, start=None, end=None):
+        lo, hi = self.span(start, end)
+        out = {'date': self._days[lo:hi]}
+        for col, values in self._totals.items():
+            out[col] = values[lo:hi]
+        return out
+
+
+class EntryStore:
+    # Rows are kept physically ordered by date (ties in insertion order), so the
+    # date column doubles as the index: lookups by day or range are a bisect and
+    # the newest row is always the last one.
+    def __init__(self, capacity=256):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._dates = np.empty(capacity, dtype='datetime64[D]')
+        self._numeric = {col: np.empty(capacity, dtype=np.float64) for col in NUMERIC_COLUMNS}
+        self._text = {col: TextColumn() for col in TEXT_COLUMNS}
+        self.daily = DailyRollup()
+        self.version = 0
+
+    @classmethod
+    def restore(cls, dates, numeric, text, daily):
+        # The arrays may be read-only memory maps: capacity equals size, so the
+        # first append copies them into fresh growable buffers. The version
+        # counts every row, as if they had been appended, so a reopened store
+        # never reuses a version some cache saw before with other rows.
+        store = cls(capacity=1)
+        store._size = store.version = len(dates)
+        if store._size:
+            store._dates = dates
+            store._numeric = dict(numeric)
+        store._text = dict(text)
+        store.daily = daily
+        return store
+
+    def snapshot(self):
+        with self._lock:
+            n = self._size
+            numeric = {col: values[:n].copy() for col, values in self._numeric.items()}
+            text = {col: values.encode(n) for col, values in self._text.items()}
+            daily = self.daily.series()
+            daily = {col: values.copy() for col, values in daily.items()}
+            return {
+                'dates': self._dates[:n].copy(),
+                'numeric': numeric,
+                'text': text,
+                'daily': daily,
+            }
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._dates)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        dates = np.empty(capacity, dtype='datetime64[D]')
+        dates[:self._size] = self._dates[:self._size]
+        self._dates = dates
+        for col, values in self._numeric.items():
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:self._size] = values[:self._size]
+            self._numeric[col] = grown
+
+    def append(self, entry):
+        day = to_day(entry['date'])
+        with self._lock:
+            self._reserve(1)
+            n = self._size
+            if n and day < self._dates[n - 1]:
+                pos = int(np.searchsorted(self._dates[:n], day, side='right'))
+                self._dates[pos + 1:n + 1] = self._dates[pos:n]
+                for values in self._numeric.values():
+                    values[pos + 1:n + 1] = values[pos:n]
+            else:
+                pos = n
+            self._dates[pos] = day
+            for col, values in self._numeric.items():
+                values[pos] = _number(entry.get(col))
+            for col, values in self._text.items():
+                values.insert(pos, entry.get(col))
+            self.daily.add(day, entry)
+            self._size = n + 1
+            self.version += 1
+            return pos
+
+    def extend(self, columns):
+        # Bulk append of whole columns (the keys of COLUMNS, dates as anything
+        # numpy can read as datetime64[D]). Rows that all sort after the
+        # current last date are copied in as a block; otherwise the two sorted
+        # runs are merged once rather than inserted row by row.
+        dates = np.asarray(columns['date'], dtype='datetime64[D]')
+        count = len(dates)
+        if not count:
+            return
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        numeric = {}
+        for col in NUMERIC_COLUMNS:
+            values = columns.get(col)
+            numeric[col] = np.full(count, np.nan) if values is None else np.asarray(values, dtype=np.float64)[order]
+        text = {}
+        for col in TEXT_COLUMNS:
+            values = columns.get(col)
+            text[col] = [None] * count if values is None else [values[i] for i in order]
+        with self._lock:
+            n = self._size
+            if not n or dates[0] >= self._dates[n - 1]:
+                self._reserve(count)
+                self._dates[n:n + count] = dates
+                for col, values in self._numeric.items():
+                    values[n:n + count] = numeric[col]
+                for col, values in self._text.items():
+                    values.extend(text[col])
+            else:
+                merged = np.argsort(np.concatenate([self._dates[:n], dates]), kind='stable')
+                capacity = max(len(self._dates), n + count)
+                self._dates = np.concatenate([self._dates[:n], dates])[merged]
+                self._dates.resize(capacity, refcheck=False)
+                for col in NUMERIC_COLUMNS:
+                    values = np.concatenate([self._numeric[col][:n], numeric[col]])[merged]
+                    values.resize(capacity, refcheck=False)
+                    self._numeric[col] = values
+                for col in TEXT_COLUMNS:
+                    combined = self._text[col][:n] + text[col]
+                    column = TextColumn()
+                    column.extend([combined[i] for i in merged])
+                    self._text[col] = column
+            self.daily.extend(dates, numeric)
+            self._size = n + count
+            self.version += count
+
+    def span(self, start=None, end=None):
+        dates = self._dates[:self._size]
+        lo = 0 if start is None else int(np.searchsorted(dates, to_day(start), side='left'))
+        hi = self._size if end is None else int(np.searchsorted(dates, to_day(end), side='right'))
+        return lo, max(lo, hi)
+
+    def columns(self, start=None, end=None, names=COLUMNS):
+        with self._lock:
+            lo, hi = self.span(start, end)
+            return self._slice(lo, hi, names)
+
+    def view(self, start=None, end=None, names=COLUMNS):
+        # columns() together with the store position of its first row and the
+        # version it was read at, for callers that map results back to rows.
+        with self._lock:
+            lo, hi = self.span(start, end)
+            return self.version, lo, self._slice(lo, hi, names)
+
+    def daily_series(self, start=None, end=None):
+        # A copy of the daily totals with the version and rollup rewrites count
+        # they were read at; the rollup's buffers are reallocated and rewritten
+        # in place by writers, so they are only safe to read under the lock.
+        with self._lock:
+            series = {col: values.copy() for col, values in self.daily.series(start, end).items()}
+            return self.version, self.daily.rewrites, series
+
+    def take(self, indices, version=None):
+        # Rows at the given positions, or None if the store has changed since
+        # version (positions shift when an earlier date is inserted).
+        with self._lock:
+            if version is not None and version != self.version:
+                return None
+            return [self.row(int(i)) for i in indices]
+
+    def _slice(self, lo, hi, names):
+        out = {}
+        for col in names:
+            if col == 'date':
+                out[col] = self._dates[lo:hi]
+            elif col in self._numeric:
+                out[col] = self._numeric[col][lo:hi]
+            else:
+                out[col] = self._text[col][lo:hi]
+        return out
+
+    def chunks(self, size, names=COLUMNS):
+        # Column dicts of at most size rows, for streaming the whole store out
+        # without decoding every text value at once.
+        for lo in range(0, len(self), size):
+            with self._lock:
+                yield self._slice(lo, min(lo + size, self._size), names)
+
+    def row(self, i):
+        day = self._dates[i].item()
+        row = {'date': day}
+        for col in COLUMNS[1:]:
+            if col in self._numeric:
+                row[col] = _plain(self._numeric[col][i].item())
+            else:
+                row[col] = self._text[col][i]
+        return row
+
+    def rows(self, start=None, end=None):
+        with self._lock:
+            lo, hi = self.span(start, end)
+            return [self.row(i) for i in range(lo, hi)]
+
+    def rows_for_date(self, day):
+        return self.rows(day, day)
+
+    def latest(self):
+        with self._lock:
+            if not self._size:
+                return None
+            return self.row(self._size - 1)
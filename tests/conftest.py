@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The app's modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app opens its storage: keep it, and everything else it writes,
+# out of the working tree. No offline food database.
+os.environ['FITLYTICS_DATA_DIR'] = tempfile.mkdtemp(prefix='fitlytics-tests-')
+os.environ['FITLYTICS_FOOD_DB'] = os.path.join(os.environ['FITLYTICS_DATA_DIR'], 'no-food-db')
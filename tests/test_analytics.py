@@ -0,0 +1,40 @@
+import datetime
+
+import numpy as np
+
+from analytics import Trends
+from store import EntryStore
+
+START = datetime.date(2024, 1, 1)
+
+
+def entry(day, kcal, burned):
+    return {'date': day, 'food': 'food', 'calories_intake': kcal, 'calories_burned': burned}
+
+
+def test_incremental_update_matches_a_fresh_build():
+    rng = np.random.default_rng(0)
+    entries = EntryStore()
+    trends = Trends()
+    reads = []
+    daily_series = entries.daily_series
+    entries.daily_series = lambda start=None, end=None: reads.append(start) or daily_series(start, end)
+    goals = (2000, 300)
+    day = START
+    for step in range(200):
+        roll = rng.random()
+        if roll < 0.1:
+            backdated = day - datetime.timedelta(days=int(rng.integers(1, 20)))  # an earlier, maybe unlogged, day
+            entries.append(entry(backdated, float(rng.integers(0, 1500)), float(rng.integers(0, 600))))
+        elif roll < 0.15:
+            goals = (int(rng.integers(1500, 2500)), int(rng.integers(100, 500)))
+        else:
+            day += datetime.timedelta(days=int(rng.choice([0, 0, 1, 1, 2])))  # same day, next day or a gap
+            entries.append(entry(day, float(rng.integers(0, 1500)), float(rng.integers(0, 600))))
+        trends.update(entries, *goals)
+        assert trends.summary(day) == Trends().update(entries, *goals).summary(day), step
+    # Appending to the last day reads only from that day on.
+    entries.append(entry(day, 100.0, 0.0))
+    reads.clear()
+    trends.update(entries, *goals)
+    assert reads == [np.datetime64(day, 'D')]
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from background import ThreadPoolManager
+from metrics import Registry, Sampler
+
+
+def wait_for(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = check()
+        if value:
+            return value
+        time.sleep(0.01)
+    raise AssertionError('timed out')
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Two managers on one database stand in for two server processes.
+    path = str(tmp_path / 'background.db')
+    managers = ThreadPoolManager(path, max_workers=2), ThreadPoolManager(path, max_workers=2)
+    yield managers
+    for manager in managers:
+        manager.executor.shutdown(wait=True)
+
+
+def test_result_and_progress_are_visible_to_another_worker(workers):
+    runner, poller = workers
+    release = threading.Event()
+
+    def double(set_progress, value):
+        set_progress('halfway')
+        release.wait(5)
+        return {'doubled': value * 2}
+
+    job = runner.call_job_fn('key-1', runner.make_job_fn(double, True), [21], {})
+    assert wait_for(lambda: poller.get_progress('key-1')) == ['halfway']
+    assert poller.job_running(str(job))
+    assert poller.get_result('key-1', str(job)) is poller.UNDEFINED
+    release.set()
+    assert wait_for(lambda: poller.result_ready('key-1'))
+    assert poller.job_running(str(job))  # until its result is collected
+    assert poller.get_result('key-1', str(job)) == {'doubled': 42}
+    assert not poller.job_running(str(job))
+    assert not runner.result_ready('key-1')
+
+
+def test_cancel_from_another_worker(workers):
+    runner, poller = workers
+    steps = []
+
+    def count(set_progress):
+        for i in range(500):
+            set_progress(i)
+            steps.append(i)
+            time.sleep(0.01)
+        return 'finished'
+
+    job = runner.call_job_fn('key-2', runner.make_job_fn(count, True), [], {})
+    wait_for(lambda: len(steps) > 3)
+    poller.terminate_job(str(job))
+    wait_for(lambda: runner.stats() == {'queued': 0, 'running': 0})
+    assert len(steps) < 500
+    assert not poller.job_running(str(job))
+    assert poller.get_result('key-2', str(job)) is poller.UNDEFINED
+
+
+def test_errors_are_results(workers):
+    runner, poller = workers
+
+    def fail():
+        raise ValueError('no such food')
+
+    job = runner.call_job_fn('key-3', runner.make_job_fn(fail, False), [], {})
+    error = wait_for(lambda: poller.result_ready('key-3')) and poller.get_result('key-3', str(job))
+    assert error['background_callback_error']['msg'] == 'no such food'
+
+
+def test_signing_secret_is_shared(workers):
+    first, second = workers
+    assert first.get_or_create_signing_secret(lambda: 'one') == 'one'
+    assert second.get_or_create_signing_secret(lambda: 'two') == 'one'
+
+
+def test_jobs_are_timed_and_profiled_under_their_callback(workers):
+    runner, poller = workers
+    seconds = Registry().histogram('background_job_seconds', 'Job time.', ['callback'])
+    sampler = Sampler(0.001).start()
+    runner.instrument(seconds, sampler)
+
+    def lookup_api():
+        time.sleep(0.1)
+        return 'done'
+
+    job = runner.call_job_fn('key-4', runner.make_job_fn(lookup_api, False), [], {})
+    wait_for(lambda: poller.result_ready('key-4'))
+    total, count = seconds.totals()[('lookup_api',)]
+    assert count == 1 and total >= 0.1
+    assert 'lookup_api (test_background.py' in sampler.collapsed(['lookup_api'])
+    assert poller.get_result('key-4', str(job)) == 'done'
@@ -0,0 +1,87 @@
+import copy
+import datetime
+import json
+
+import pytest
+
+import app
+from bench import find_component, request_body
+
+
+def apply_patch(figure, patch):
+    # The subset of Dash's clientside patch operations refresh_dashboard uses.
+    figure = copy.deepcopy(figure)
+    for op in patch['operations']:
+        *path, last = op['location']
+        target = figure
+        for key in path:
+            target = target[key]
+        if op['operation'] == 'Assign':
+            target[last] = op['params']['value']
+        elif op['operation'] == 'Extend':
+            target[last].extend(op['params']['value'])
+        else:
+            raise AssertionError(f"unexpected patch operation {op['operation']}")
+    return figure
+
+
+def entry(day, kcal, burned, protein):
+    return {'date': day, 'food': 'food', 'calories_intake': kcal, 'protein': protein, 'fat': 10.0,
+            'carbs': 30.0, 'calories_burned': burned, 'goal_intake': 2200, 'goal_burned': 400}
+
+
+@pytest.fixture
+def client():
+    client = app.server.test_client()
+    client.get('/')
+    session = client.get_cookie(app.SESSION_COOKIE).value
+    return client, session
+
+
+def post(client, name, values):
+    response = client.post('/_dash-update-component', json=request_body(app.app, name, values))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_patched_figures_match_a_fresh_build(client):
+    client, session = client
+    today = datetime.date.today()
+    for offset in range(20, 0, -1):
+        app.storage.add(session, entry(today - datetime.timedelta(days=offset), 1500 + offset, 300 + offset, 50 + offset))
+    page = post(client, 'display_dashboard', {'dashboard-visit.data': 1})
+    state = find_component(page, 'dashboard-state')['props']['data']
+    figures = {name: find_component(page, f'{name}-graph')['props']['figure'] for name in ('intake', 'burned', 'macros')}
+    for figure in figures.values():
+        assert all(isinstance(trace['y'], list) for trace in figure['data'])
+
+    app.storage.add(session, entry(today - datetime.timedelta(days=1), 900, 100, 80))  # the last plotted day
+    app.storage.add(session, entry(today, 4000, 2000, 120))  # a new day with new peaks
+    response = post(client, 'refresh_dashboard', {'dashboard-refresh.n_intervals': 1,
+                                                  'dashboard-window.value': state['window'],
+                                                  'dashboard-state.data': state})['response']
+    fresh = app.build_dashboard_figures(app.storage.entries(session), state['window'], state['start'])
+    for name in ('intake', 'burned', 'macros'):
+        patch = response[f'{name}-graph']['figure']
+        assert patch['__dash_patch_update'] == '__dash_patch_update'
+        assert apply_patch(figures[name], patch) == json.loads(json.dumps(fresh[name]))
+    assert response['dashboard-state']['data']['days'] == fresh['state']['days']
+
+
+def test_a_window_that_moved_on_is_rebuilt(client):
+    client, session = client
+    today = datetime.date.today()
+    for offset in range(10, -1, -1):
+        app.storage.add(session, entry(today - datetime.timedelta(days=offset), 1500 + offset, 300, 50))
+    page = post(client, 'display_dashboard', {'dashboard-visit.data': 1})
+    state = find_component(page, 'dashboard-state')['props']['data']
+    # The same store version, but the state was built for the 7d window as of
+    # yesterday, before midnight moved its first day on.
+    yesterday = str(today - datetime.timedelta(days=7))
+    stale = dict(state, window='7d', start=yesterday, exact=True, last_day=str(today))
+    response = post(client, 'refresh_dashboard', {'dashboard-refresh.n_intervals': 1, 'dashboard-window.value': '7d',
+                                                  'dashboard-state.data': stale})['response']
+    figure = response['intake-graph']['figure']
+    assert '__dash_patch_update' not in figure
+    assert len(figure['data'][0]['x']) == 7
+    assert response['dashboard-state']['data']['start'] == str(today - datetime.timedelta(days=6))
@@ -0,0 +1,33 @@
+import numpy as np
+
+from downsample import bucket_means, choose_unit
+
+
+def days(start, count, step=1):
+    return np.datetime64(start, 'D') + np.arange(0, count * step, step).astype('timedelta64[D]')
+
+
+def test_choose_unit_keeps_buckets_within_budget():
+    assert choose_unit(days('2024-01-01', 400)) == 'D'
+    dates = days('2000-01-01', 2800)
+    assert choose_unit(dates) == 'M'  # 2800 days span 401 calendar weeks
+    assert choose_unit(days('2000-01-03', 2800)) == 'W'  # but starting on a Monday only 400
+    assert choose_unit(days('1980-01-01', 34 * 366)) == 'Y'
+
+
+def test_chosen_unit_fits_budget():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        count = int(rng.integers(1, 20000))
+        dates = np.sort(np.datetime64('1950-01-01') + rng.integers(0, 60 * 365, count).astype('timedelta64[D]'))
+        budget = int(rng.integers(1, 500))
+        unit = choose_unit(dates, budget)
+        labels, _ = bucket_means(dates, {'value': np.ones(count)}, unit)
+        assert len(labels) <= budget or unit == 'Y'
+
+
+def test_bucket_means_by_year():
+    dates = np.array(['2023-05-01', '2023-06-01', '2024-02-01'], dtype='datetime64[D]')
+    labels, means = bucket_means(dates, {'value': np.array([1.0, 3.0, 5.0])}, 'Y')
+    assert labels.astype(str).tolist() == ['2023-01-01', '2024-01-01']
+    assert means['value'].tolist() == [2.0, 5.0]
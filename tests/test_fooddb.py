@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from fooddb import FoodDatabase, import_dump, search_key
+
+PRODUCTS = [
+    ('Apple', 52, 0.3, 0.2, 14),
+    ('Chicken breast', 165, 31, 3.6, 0),
+    ('Banana', 89, 1.1, 0.3, 23),
+    ('Oat milk', 46, 1, 1.5, 6.7),
+    ('7UP', 39, 0, 0, 9.8),
+]
+
+
+def test_search_key_strips_quantities_with_units():
+    assert search_key('Apple 100g') == 'apple'
+    assert search_key('Milk 1.5l 2') == 'milk'
+    assert search_key('Oats 40,5g') == 'oats'
+
+
+def test_search_key_keeps_names_starting_with_digits():
+    assert search_key('7up 330ml') == '7up'
+    assert search_key('7UP') == '7up'
+    assert search_key('100 Grand bar') == 'grand bar'
+
+
+def write_tsv(path):
+    lines = ['code\tproduct_name\tenergy-kcal_100g\tproteins_100g\tfat_100g\tcarbohydrates_100g']
+    lines += [f'{i}\t{name}\t{kcal}\t{protein}\t{fat}\t{carbs}' for i, (name, kcal, protein, fat, carbs) in enumerate(PRODUCTS)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def write_jsonl(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for name, kcal, protein, fat, carbs in PRODUCTS:
+            nutriments = {'energy-kcal_100g': kcal, 'proteins_100g': protein, 'fat_100g': fat, 'carbohydrates_100g': carbs}
+            f.write(json.dumps({'product_name': name, 'nutriments': nutriments}) + '\n')
+        f.write('not json\n')
+
+
+@pytest.fixture(params=['dump.tsv', 'dump.jsonl'])
+def food_db(request, tmp_path):
+    dump = tmp_path / request.param
+    (write_tsv if request.param.endswith('.tsv') else write_jsonl)(dump)
+    path = str(tmp_path / 'foods.db')
+    assert import_dump(str(dump), path) == len(PRODUCTS)
+    return FoodDatabase(path)
+
+
+@pytest.mark.parametrize('query, name', [
+    ('apple', 'Apple'),
+    ('Apple 150g', 'Apple'),
+    ('chicken', 'Chicken breast'),
+    ('chiken breast', 'Chicken breast'),
+    ('7up 330ml', '7UP'),
+    ('oat mil', 'Oat milk'),
+])
+def test_lookup_finds_close_matches(food_db, query, name):
+    expected = next(product for product in PRODUCTS if product[0] == name)
+    assert food_db.lookup(query) == dict(zip(('calories', 'protein', 'fat', 'carbs'), expected[1:]))
+
+
+@pytest.mark.parametrize('query', ['bread', 'pineapple', 'breast', 'milkshake', 'kiwi', '250g'])
+def test_lookup_rejects_weak_matches(food_db, query):
+    assert food_db.lookup(query) is None
+
+
+def test_search_still_lists_weak_matches(food_db):
+    matches = food_db.search('pineapple')
+    assert [match['name'] for match in matches][:1] == ['Apple']
+    assert matches[0]['match'] == 'fuzzy' and matches[0]['score'] < 0.5
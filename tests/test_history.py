@@ -0,0 +1,77 @@
+import datetime
+
+import pytest
+
+from history import parse_filter, select
+from store import EntryStore
+
+ROWS = [
+    ('2024-01-30', 'Apple', 95.0),
+    ('2024-01-31', 'apple pie', 400.0),
+    ('2024-02-01', 'Rice', None),
+    ('2024-02-01', 'Bread', 250.0),
+    ('2024-02-15', None, 120.0),
+    ('2024-03-01', 'Soup', 180.0),
+]
+
+
+@pytest.fixture
+def entries():
+    entries = EntryStore()
+    for day, food, kcal in ROWS:
+        entries.append({'date': datetime.date.fromisoformat(day), 'food': food, 'calories_intake': kcal})
+    return entries
+
+
+def foods(entries, filter_query=None, sort_by=None):
+    version, order = select(entries, filter_query, sort_by)
+    assert version == entries.version
+    return [entries.row(int(i))['food'] for i in order]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('', ['Soup', None, 'Bread', 'Rice', 'apple pie', 'Apple']),  # newest first
+    ('{date} = 2024-02-01', ['Bread', 'Rice']),
+    ('{date} datestartswith 2024-02', [None, 'Bread', 'Rice']),
+    ('{date} >= 2024-01-31 && {date} < 2024-02-15', ['Bread', 'Rice', 'apple pie']),
+    ('{date} > 2024-02 && {date} <= 2024', ['Soup']),
+    ('{date} < 2024-01-30', []),
+    ('{date} >= 2024-03-01 && {date} <= 2024-01-01', []),
+    ('{date} != 2024-02-01', ['Soup', None, 'apple pie', 'Apple']),
+    ('{date} != 2024-02 && {date} != 2024-01-31', ['Soup', 'Apple']),
+    ('{calories_intake} >= 180', ['Soup', 'Bread', 'apple pie']),
+    ('{calories_intake} != 95', ['Soup', None, 'Bread', 'Rice', 'apple pie']),
+])
+def test_date_and_number_terms(entries, query, expected):
+    assert foods(entries, query) == expected
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{food} contains apple', ['apple pie']),
+    ('{food} scontains Apple', ['Apple']),
+    ('{food} icontains APPLE', ['apple pie', 'Apple']),
+    ('{food} = Rice', ['Rice']),
+    ('{food} eq rice', []),
+    ('{food} ieq rice', ['Rice']),
+    ('{food} != Rice', ['Soup', 'Bread', 'apple pie', 'Apple']),
+    ('{food} icontains "e p" && {calories_intake} > 100', ['apple pie']),
+])
+def test_text_terms_ignore_case_only_with_i(entries, query, expected):
+    assert foods(entries, query) == expected
+
+
+def test_unknown_columns_and_bad_values_are_dropped():
+    assert parse_filter('{nope} = 1 && {calories_intake} > lots && {food} contains egg') == [('food', 'contains', True, 'egg')]
+
+
+def test_sort_puts_missing_numbers_last_both_ways(entries):
+    ascending = foods(entries, sort_by=[{'column_id': 'calories_intake', 'direction': 'asc'}])
+    descending = foods(entries, sort_by=[{'column_id': 'calories_intake', 'direction': 'desc'}])
+    assert ascending == ['Apple', None, 'Soup', 'Bread', 'apple pie', 'Rice']
+    assert descending == ['apple pie', 'Bread', 'Soup', None, 'Apple', 'Rice']
+
+
+def test_sort_by_several_columns_within_a_filter(entries):
+    order = foods(entries, '{date} >= 2024-02-01', [{'column_id': 'date', 'direction': 'desc'},
+                                                    {'column_id': 'food', 'direction': 'asc'}])
+    assert order == ['Soup', None, 'Bread', 'Rice']
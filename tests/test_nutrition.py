@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from bench import StubHandler, start_stub
+from nutrition import NutritionClient
+
+
+class MissingHandler(StubHandler):
+    # The bench stub, except that searches for 'unknown ...' find nothing.
+    def do_GET(self):
+        terms = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)['search_terms'][0]
+        if not terms.startswith('unknown'):
+            return super().do_GET()
+        StubHandler.calls += 1
+        body = json.dumps({'products': []}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    StubHandler.calls = 0
+    server, url = start_stub(0.01, MissingHandler)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_identical_lookups_share_one_request(stub):
+    MissingHandler.latency = 0.3
+    client = NutritionClient(search_url=stub)
+    barrier = threading.Barrier(16)
+    results = []
+
+    def lookup(name):
+        barrier.wait()
+        results.append(client.lookup(name))
+
+    threads = [threading.Thread(target=lookup, args=(name,)) for name in ['apple', 'Apple', ' APPLE '] * 5 + ['apple']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert StubHandler.calls == 1
+    assert len(results) == 16 and all(result == results[0] for result in results)
+    assert results[0]['calories'] == 52
+
+
+def test_entries_expire_after_ttl(stub):
+    client = NutritionClient(search_url=stub, ttl=0.3)
+    client.lookup('apple')
+    client.lookup('apple')
+    assert (StubHandler.calls, client.hits) == (1, 1)
+    time.sleep(0.4)
+    client.lookup('apple')
+    assert StubHandler.calls == 2
+
+
+def test_misses_expire_after_miss_ttl(stub):
+    client = NutritionClient(search_url=stub, ttl=60, miss_ttl=0.3)
+    assert client.lookup('unknown food') is None
+    client.lookup('apple')
+    assert client.lookup('unknown food') is None
+    assert StubHandler.calls == 2
+    time.sleep(0.4)
+    assert client.lookup('unknown food') is None
+    client.lookup('apple')
+    assert StubHandler.calls == 3
+
+
+def test_least_recently_used_entry_is_evicted(stub):
+    client = NutritionClient(search_url=stub, max_entries=2)
+    client.lookup('apple')
+    client.lookup('banana')
+    client.lookup('apple')
+    client.lookup('cherry')  # evicts banana, the least recently used
+    assert list(client._cache) == ['apple', 'cherry']
+    assert StubHandler.calls == 3
+    client.lookup('apple')
+    assert StubHandler.calls == 3
+    client.lookup('banana')
+    assert StubHandler.calls == 4
+
+
+def test_new_client_loads_saved_cache(stub, tmp_path):
+    path = str(tmp_path / 'cache' / 'nutrition.json')
+    client = NutritionClient(search_url=stub, cache_path=path)
+    found = client.lookup('apple')
+    assert client.lookup('unknown food') is None
+    client.save()
+
+    fresh = NutritionClient(search_url=stub, cache_path=path)
+    assert fresh.lookup('Apple') == found
+    assert fresh.lookup('unknown food') is None
+    assert (StubHandler.calls, fresh.hits, fresh.misses) == (2, 2, 0)
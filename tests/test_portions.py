@@ -0,0 +1,47 @@
+import pytest
+
+from portions import Portion, parse_meal, parse_portion, scale_nutrition
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('150g rice', Portion('rice', 150.0, 'g', 150.0)),
+    ('1.5 cups milk', Portion('milk', 1.5, 'cups', 360.0)),
+    ('2 eggs', Portion('eggs', 2.0, 'piece', 100.0)),
+    ('Apple 100g', Portion('Apple', 100.0, 'g', 100.0)),
+    ('1,5 kg potatoes', Portion('potatoes', 1.5, 'kg', 1500.0)),
+    ('1/2 cup oats', Portion('oats', 0.5, 'cup', 120.0)),
+    ('100 g of chicken', Portion('chicken', 100.0, 'g', 100.0)),
+    ('3 slices bread', Portion('bread', 3.0, 'piece', 90.0)),
+    ('2x yogurt', Portion('yogurt', 2.0, 'piece', 300.0)),
+    ('mac and cheese 200g', Portion('mac and cheese', 200.0, 'g', 200.0)),
+    ('7up', Portion('7up', None, None, None)),
+    ('7up 330ml', Portion('7up', 330.0, 'ml', 330.0)),
+    ('banana', Portion('banana', None, None, None)),
+])
+def test_parse_portion(text, expected):
+    assert parse_portion(text) == expected
+
+
+@pytest.mark.parametrize('text, names', [
+    ('2 eggs, 150g rice, 1 banana', ['eggs', 'rice', 'banana']),
+    ('mac and cheese 200g', ['mac and cheese']),
+    ('fish and chips, 1 banana', ['fish and chips', 'banana']),
+    ('1,5 kg potatoes', ['potatoes']),
+    ('1,5 kg potatoes,2 eggs', ['potatoes', 'eggs']),
+    ('2 eggs;150g rice\n\napple,banana', ['eggs', 'rice', 'apple', 'banana']),
+    (' , ;\n', []),
+    (None, []),
+])
+def test_parse_meal(text, names):
+    assert [portion.name for portion in parse_meal(text)] == names
+
+
+def test_parse_meal_keeps_decimal_comma_amounts():
+    assert parse_meal('1,5 kg potatoes, 0,5l milk') == [Portion('potatoes', 1.5, 'kg', 1500.0), Portion('milk', 0.5, 'l', 500.0)]
+
+
+def test_scale_nutrition():
+    per_100g = {'calories': 52, 'protein': 0.3, 'fat': 0.2, 'carbs': 14}
+    assert scale_nutrition(per_100g, 150) == {'calories': 78.0, 'protein': 0.4, 'fat': 0.3, 'carbs': 21.0}
+    assert scale_nutrition(per_100g, None) is per_100g
+    assert scale_nutrition(None, 150) is None
@@ -0,0 +1,173 @@
+import datetime
+import glob
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from storage import LogBackend, LogStorage
+
+DAY = datetime.date(2024, 1, 1)
+
+
+def entry(offset, food='apple', kcal=100.0):
+    return {'date': DAY + datetime.timedelta(days=offset), 'food': food, 'calories_intake': kcal,
+            'protein': 1.0, 'fat': 2.0, 'carbs': 3.0, 'exercise': None, 'calories_burned': 50.0,
+            'goal_intake': 2000.0, 'goal_burned': 300.0}
+
+
+def reopen(storage):
+    storage.close()
+    fresh = LogStorage(storage.root, storage.compact_every)
+    fresh.open()
+    return fresh
+
+
+def foods(storage):
+    return [row['food'] for row in storage.entries.rows()]
+
+
+def daily_intake(storage):
+    _, _, series = storage.entries.daily_series()
+    return dict(zip(series['date'].astype(str).tolist(), series['calories_intake'].tolist()))
+
+
+def test_restart_after_compaction_replays_later_records(tmp_path):
+    storage = LogStorage(str(tmp_path), compact_every=10 ** 6)
+    storage.open()
+    storage.add_many([entry(i, f'food {i}') for i in range(5)])
+    storage.compact()
+    storage.add_many([entry(i, f'food {i}') for i in range(5, 8)])
+    storage.add(entry(2, 'late'))
+
+    storage = reopen(storage)
+    assert foods(storage) == ['food 0', 'food 1', 'food 2', 'late', 'food 3', 'food 4', 'food 5', 'food 6', 'food 7']
+    assert daily_intake(storage)['2024-01-03'] == 200.0
+    assert len(glob.glob(os.path.join(str(tmp_path), 'wal.*.log'))) == 1
+
+    storage.add(entry(8, 'food 8'))
+    storage = reopen(storage)
+    assert len(storage.entries) == 10
+    storage.close()
+
+
+def test_reopened_store_version_counts_every_row(tmp_path):
+    storage = LogStorage(str(tmp_path))
+    storage.open()
+    storage.add_many([entry(i, f'food {i}') for i in range(20)])
+    storage.compact()
+    storage.add(entry(20, 'food 20'))
+    version = storage.entries.version
+    assert version == 21
+
+    storage = reopen(storage)
+    assert storage.entries.version == version
+    storage.add(entry(21, 'food 21'))
+    assert storage.entries.version == version + 1
+    storage.close()
+
+
+def test_truncated_last_wal_line_is_dropped(tmp_path):
+    storage = LogStorage(str(tmp_path))
+    storage.open()
+    storage.add_many([entry(i, f'food {i}') for i in range(3)])
+    storage.close()
+    (wal,) = glob.glob(os.path.join(str(tmp_path), 'wal.*.log'))
+    size = os.path.getsize(wal)
+    with open(wal, 'ab') as f:
+        f.write(b'{"date":"2024-01-09","food":"torn","calor')
+
+    storage = reopen(storage)
+    assert foods(storage) == ['food 0', 'food 1', 'food 2']
+    assert os.path.getsize(wal) == size
+
+    storage.add(entry(3, 'food 3'))
+    storage = reopen(storage)
+    assert foods(storage) == ['food 0', 'food 1', 'food 2', 'food 3']
+    storage.close()
+
+
+def test_backdated_append_onto_restored_segment(tmp_path):
+    storage = LogStorage(str(tmp_path))
+    storage.open()
+    storage.add_many([entry(i, f'food {i}') for i in range(10, 13)])
+    storage.compact()
+    storage = reopen(storage)
+    assert not storage.entries._dates.flags.writeable  # still the memory-mapped segment
+
+    storage.add(entry(5, 'early'))
+    storage.add(entry(11, 'middle', kcal=40.0))
+    expected = ['early', 'food 10', 'food 11', 'middle', 'food 12']
+    assert foods(storage) == expected
+    assert daily_intake(storage) == {'2024-01-06': 100.0, '2024-01-11': 100.0, '2024-01-12': 140.0, '2024-01-13': 100.0}
+
+    storage = reopen(storage)
+    assert foods(storage) == expected
+    assert daily_intake(storage)['2024-01-12'] == 140.0
+    storage.compact()
+    storage = reopen(storage)
+    assert foods(storage) == expected
+    storage.close()
+
+
+@pytest.mark.filterwarnings('error::pytest.PytestUnhandledThreadExceptionWarning')
+def test_compaction_concurrent_with_add_many(tmp_path):
+    storage = LogStorage(str(tmp_path), compact_every=50)
+    storage.open()
+    writers, batches, size = 4, 40, 7
+
+    def write(w):
+        for b in range(batches):
+            storage.add_many([entry((b * size + i) % 30, f'{w}-{b}-{i}') for i in range(size)])
+
+    def compact():
+        for _ in range(20):
+            storage.compact()
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    threads.append(threading.Thread(target=compact))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    while storage._compacting:
+        threading.Event().wait(0.01)
+
+    expected = sorted(f'{w}-{b}-{i}' for w in range(writers) for b in range(batches) for i in range(size))
+    assert sorted(foods(storage)) == expected
+    storage = reopen(storage)
+    assert sorted(foods(storage)) == expected
+    dates = storage.entries.columns(names=('date',))['date']
+    assert np.all(dates[1:] >= dates[:-1])
+    assert sum(daily_intake(storage).values()) == 100.0 * len(expected)
+    storage.close()
+
+
+def test_log_backend_defers_disk_until_first_write(tmp_path):
+    backend = LogBackend(str(tmp_path))
+    entries = backend.entries('nobody')
+    assert len(entries) == 0
+    assert os.listdir(str(tmp_path)) == []
+
+    backend.add('nobody', entry(0))
+    assert backend.entries('nobody') is entries
+    assert len(entries) == 1
+    assert glob.glob(os.path.join(str(tmp_path), 'nobody', 'wal.*.log'))
+    backend.close()
+
+
+def test_log_backend_closes_least_recently_used_partitions(tmp_path):
+    backend = LogBackend(str(tmp_path), max_users=2)
+    for user in ('a', 'b'):
+        backend.add(user, entry(0, user))
+    first = backend._partitions['a']
+    backend.entries('a')  # 'b' is now the least recently used
+    backend.add('c', entry(0, 'c'))
+
+    assert list(backend._partitions) == ['a', 'c']
+    assert backend._partitions['a'] is first
+    backend.add('b', entry(1, 'b again'))
+    assert [row['food'] for row in backend.entries('b').rows()] == ['b', 'b again']
+    assert first.closed and 'a' not in backend._partitions
+    backend.close()
@@ -0,0 +1,91 @@
+import collections
+import re
+import socket
+
+import numpy as np
+import pytest
+
+import app
+from bench import dispatch, page_end_id, start_stub
+
+
+@pytest.fixture
+def page():
+    client = app.server.test_client()
+    end_id = page_end_id(client.get('/').get_data(as_text=True))
+    session = client.get_cookie(app.SESSION_COOKIE).value
+
+    def call(name, values):
+        response = dispatch(lambda params, body: client.post('/_dash-update-component', query_string=params, json=body),
+                            app.app, name, values, end_id=end_id)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()['response']
+
+    return call, session
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    # A port nothing listens on: connecting is refused at once.
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    monkeypatch.setattr(app.nutrition_client, 'search_url', f'http://127.0.0.1:{port}/cgi/search.pl')
+
+
+def test_add_entry_saves_typed_values_when_the_lookup_fails(page, unreachable):
+    call, session = page
+    response = call('add_entry', {'add-entry-btn.n_clicks': 1, 'food-input.value': 'unreachable soup',
+                                  'calories-input.value': 250, 'goal-intake-input.value': 2500,
+                                  'goal-burned-input.value': 500})
+    assert 'lookup failed' in response['tracker-msg']['children']
+    latest = app.storage.entries(session).latest()
+    assert (latest['food'], latest['calories_intake'], latest['protein']) == ('unreachable soup', 250, None)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, url = start_stub(0.01)
+    monkeypatch.setattr(app.nutrition_client, 'search_url', url)
+    yield
+    server.shutdown()
+
+
+def test_add_meal_runs_in_the_background(page, stub):
+    call, session = page
+    jobs = count('fitlytics_background_job_seconds', 'add_meal')
+    response = call('add_meal', {'add-meal-btn.n_clicks': 1, 'meal-input.value': '150g stub rice\n2 stub eggs',
+                                 'goal-intake-input.value': 2500, 'goal-burned-input.value': 500})
+    assert response['meal-msg']['children'] == 'Added 2 items.'
+    assert count('fitlytics_background_job_seconds', 'add_meal') == jobs + 1
+    rows = list(app.storage.entries(session).rows())[-2:]
+    assert [row['food'] for row in rows] == ['stub rice (150 g)', 'stub eggs (100 g)']
+
+
+def count(series, callback):
+    text = app.server.test_client().get('/metrics').get_data(as_text=True)
+    match = re.search(rf'^{series}_count{{callback="{callback}"}} (\S+)$', text, re.M)
+    return 0 if match is None else float(match.group(1))
+
+
+def test_background_jobs_are_timed_apart_from_their_polls(page, unreachable):
+    call, _ = page
+    requests, jobs = count('fitlytics_callback_seconds', 'add_entry'), count('fitlytics_background_job_seconds', 'add_entry')
+    call('add_entry', {'add-entry-btn.n_clicks': 1, 'food-input.value': 'unreachable stew', 'calories-input.value': 300,
+                       'goal-intake-input.value': 2500, 'goal-burned-input.value': 500})
+    # The request that started the job is timed; the polls for its result are not.
+    assert count('fitlytics_callback_seconds', 'add_entry') == requests + 1
+    assert count('fitlytics_background_job_seconds', 'add_entry') == jobs + 1
+
+
+def test_history_cache_is_bounded_by_rows_held(monkeypatch):
+    monkeypatch.setattr(app, 'history_cache', collections.OrderedDict())
+    monkeypatch.setattr(app, 'history_cache_rows', 0)
+    monkeypatch.setattr(app, 'HISTORY_CACHE_ROWS', 100)
+    for key in 'abc':
+        app.cache_history(key, (1, np.arange(40)))
+    assert list(app.history_cache) == ['b', 'c'] and app.history_cache_rows == 80
+    app.cache_history('b', (2, np.arange(10)))
+    assert list(app.history_cache) == ['c', 'b'] and app.history_cache_rows == 50
+    app.cache_history('d', (1, np.arange(500)))  # too long to share, but still the page being viewed
+    assert list(app.history_cache) == ['d'] and app.history_cache_rows == 500
@@ -0,0 +1,92 @@
+import io
+import math
+
+import pandas as pd
+import pytest
+
+from storage import SQLiteStorage
+from transfer import export_entries, import_entries, validate
+
+CSV = """date,food,calories_intake,protein,fat,carbs,exercise,calories_burned,goal_intake,goal_burned
+2024-01-01,apple,95,0.5,0.3,25,,0,2000,300
+2024-01-02,rice,,4,0.4,45,run,350,2000,300
+not a date,bread,80,3,1,15,,0,2000,300
+2024-01-03,soup,lots,2,1,10,,0,2000,300
+2024-01-04,cake,-5,1,1,1,,0,2000,300
+2024-01-05,"oats, milk",300,10,5,50,walk,120,2100,350
+"""
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'fitlytics.db'))
+    yield storage
+    storage.close()
+
+
+def test_validate_rejects_bad_rows_by_reason():
+    frame = pd.DataFrame({
+        'date': ['2024-01-01', '2024-13-01', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-06'],
+        'food': ['apple', 'pear', 'nan', None, '', 'plum'],
+        'calories_intake': ['95', '10', 'junk', '-1', '', ' '],
+        'protein': [1.0, 1.0, 1.0, 1.0, float('nan'), float('inf')],
+    })
+    columns, reasons = validate(frame)
+    assert reasons == {'bad date': 1, 'bad calories_intake': 1, 'negative calories_intake': 1, 'bad protein': 1}
+    assert [str(day) for day in columns['date']] == ['2024-01-01', '2024-01-05']
+    assert columns['calories_intake'][0] == 95.0
+    # A blank number is missing, not junk, and is kept as NaN.
+    assert math.isnan(columns['calories_intake'][1]) and math.isnan(columns['protein'][1])
+    assert columns['food'] == ['apple', None]
+    assert 'exercise' not in columns
+
+
+def test_validate_stores_missing_text_as_none():
+    # A missing value in a text column comes through pandas as a float NaN,
+    # which must not be stored as the text "nan".
+    frame = pd.DataFrame({'date': ['2024-01-01', '2024-01-02', '2024-01-03'],
+                          'food': ['apple', float('nan'), None], 'exercise': [float('nan'), 'run', '']})
+    columns, reasons = validate(frame)
+    assert reasons == {}
+    assert columns['food'] == ['apple', None, None]
+    assert columns['exercise'] == [None, 'run', None]
+
+
+def test_validate_needs_a_date_column():
+    with pytest.raises(ValueError, match='date'):
+        validate(pd.DataFrame({'food': ['apple']}))
+
+
+def test_csv_import_then_export_round_trips(storage, tmp_path):
+    result = import_entries(storage, 'u', io.StringIO(CSV), 'csv', chunk_rows=2)
+    assert result.imported == 3
+    assert result.rejected == 3
+    assert result.reasons == {'bad date': 1, 'bad calories_intake': 1, 'negative calories_intake': 1}
+
+    path = tmp_path / 'history.csv'
+    export_entries(storage.entries('u'), str(path), 'csv', chunk_rows=2)
+    exported = pd.read_csv(path, dtype={'food': str, 'exercise': str})
+    assert exported['date'].tolist() == ['2024-01-01', '2024-01-02', '2024-01-05']
+    assert exported['food'].tolist() == ['apple', 'rice', 'oats, milk']
+    assert math.isnan(exported['calories_intake'][1])
+
+    again = SQLiteStorage(str(tmp_path / 'again.db'))
+    try:
+        assert import_entries(again, 'u', str(path), 'csv').imported == 3
+        assert list(again.entries('u').rows()) == list(storage.entries('u').rows())
+    finally:
+        again.close()
+
+
+def test_parquet_round_trip(storage, tmp_path):
+    pytest.importorskip('pyarrow')
+    import_entries(storage, 'u', io.StringIO(CSV), 'csv')
+    path = tmp_path / 'history.parquet'
+    export_entries(storage.entries('u'), str(path), 'parquet', chunk_rows=2)
+    again = SQLiteStorage(str(tmp_path / 'again.db'))
+    try:
+        result = import_entries(again, 'u', str(path), 'parquet')
+        assert (result.imported, result.rejected) == (3, 0)
+        assert list(again.entries('u').rows()) == list(storage.entries('u').rows())
+    finally:
+        again.close()
@@ -0,0 +1,175 @@
+"""Bulk import and export of tracker history as CSV or Parquet.
+
+Files are read and written in chunks of CHUNK_ROWS rows, and every chunk is
+validated and converted column-wise: dates must parse, numbers must parse and
+be non-negative, and rows failing either check are skipped and counted rather
+than failing the whole import. Accepted rows go to the store in one bulk call
+per chunk. Parquet needs the optional ``pyarrow`` package.
+
+    python transfer.py --session <fitlytics_session cookie> import history.csv
+    python transfer.py --session <fitlytics_session cookie> export history.parquet
+"""
+import argparse
+import collections
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from store import COLUMNS, NUMERIC_COLUMNS, TEXT_COLUMNS
+
+CHUNK_ROWS = 100000
+FORMATS = ('csv', 'parquet')
+
+ImportResult = collections.namedtuple('ImportResult', ['imported', 'rejected', 'reasons'])
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Parquet support needs pyarrow: pip install pyarrow') from None
+    return pyarrow
+
+
+def detect_format(name):
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.csv', '.txt', ''):
+        return 'csv'
+    raise ValueError(f'Unsupported file type {extension!r}; use .csv or .parquet')
+
+
+def read_chunks(source, fmt, chunk_rows=CHUNK_ROWS):
+    if fmt == 'parquet':
+        parquet = _pyarrow().parquet.ParquetFile(source)
+        wanted = [name for name in parquet.schema_arrow.names if name in COLUMNS]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=wanted):
+            yield batch.to_pandas()
+    else:
+        # Numeric columns are typed by the C parser; one holding junk comes
+        # back as strings and is coerced in validate().
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype={col: str for col in ('date',) + TEXT_COLUMNS},
+                               usecols=lambda name: name in COLUMNS)
+
+
+def validate(frame):
+    # Returns the accepted rows as store columns plus a count of rejected rows
+    # per reason.
+    if 'date' not in frame.columns:
+        raise ValueError("Missing required column 'date'")
+    reasons = collections.Counter()
+    dates = pd.to_datetime(frame['date'], errors='coerce', format='ISO8601')
+    keep = dates.notna().to_numpy()
+    reasons['bad date'] += int((~keep).sum())
+    numeric = {}
+    for col in NUMERIC_COLUMNS:
+        if col not in frame.columns:
+            continue
+        raw = frame[col]
+        if pd.api.types.is_numeric_dtype(raw):
+            values = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+            bad = np.isinf(values)
+        else:
+            values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            present = raw.notna().to_numpy() & raw.astype(str).str.strip().ne('').to_numpy()
+            bad = present & ~np.isfinite(values)
+        negative = values < 0
+        reasons[f'bad {col}'] += int((keep & bad).sum())
+        keep = keep & ~bad
+        reasons[f'negative {col}'] += int((keep & negative).sum())
+        keep = keep & ~negative
+        numeric[col] = values
+    columns = {'date': dates.to_numpy()[keep].astype('datetime64[D]')}
+    for col, values in numeric.items():
+        columns[col] = values[keep]
+    for col in TEXT_COLUMNS:
+        if col in frame.columns:
+            text = frame[col][keep].astype(object)
+            text = text.where(text.notna() & text.astype(str).ne(''), None)
+            columns[col] = [None if value is None else str(value) for value in text]
+    return columns, +reasons
+
+
+def import_entries(storage, user, source, fmt, chunk_rows=CHUNK_ROWS, progress=None):
+    imported, rejected, reasons = 0, 0, collections.Counter()
+    for frame in read_chunks(source, fmt, chunk_rows):
+        columns, chunk_reasons = validate(frame)
+        count = len(columns['date'])
+        if count:
+            storage.add_columns(user, columns)
+        imported += count
+        rejected += len(frame) - count
+        reasons.update(chunk_reasons)
+        if progress:
+            progress(imported, rejected)
+    return ImportResult(imported, rejected, dict(reasons))
+
+
+def _frame(columns):
+    frame = pd.DataFrame({col: columns[col] for col in COLUMNS[1:]})
+    frame.insert(0, 'date', np.datetime_as_string(columns['date'], unit='D'))
+    return frame
+
+
+def export_entries(entries, target, fmt, chunk_rows=CHUNK_ROWS):
+    # target is a path or a binary file object.
+    if fmt == 'parquet':
+        pa = _pyarrow()
+        schema = pa.schema([('date', pa.date32())]
+                           + [(col, pa.float64()) if col in NUMERIC_COLUMNS else (col, pa.string()) for col in COLUMNS[1:]])
+        with pa.parquet.ParquetWriter(target, schema) as writer:
+            for columns in entries.chunks(chunk_rows):
+                arrays = [pa.array(columns['date'])] + [pa.array(columns[col], type=schema.field(col).type, from_pandas=True)
+                                                         for col in COLUMNS[1:]]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return
+    close = isinstance(target, (str, os.PathLike))
+    f = open(target, 'w', encoding='utf-8', newline='') if close else io.TextIOWrapper(target, encoding='utf-8', newline='')
+    try:
+        f.write(','.join(COLUMNS) + '\n')
+        for columns in entries.chunks(chunk_rows):
+            _frame(columns).to_csv(f, header=False, index=False)
+    finally:
+        if close:
+            f.close()
+        else:
+            f.flush()
+            f.detach()
+
+
+def main(argv=None):
+    from storage import open_storage
+    parser = argparse.ArgumentParser(description='Import or export Fitlytics tracker history.')
+    parser.add_argument('--data-dir', default=os.environ.get('FITLYTICS_DATA_DIR', 'fitlytics_data'))
+    parser.add_argument('--session', required=True, help='value of the fitlytics_session cookie to read or write')
+    parser.add_argument('--format', choices=FORMATS, help='defaults to the file extension')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('import').add_argument('file')
+    commands.add_parser('export').add_argument('file')
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.file)
+    storage = open_storage(args.data_dir)
+    started = time.time()
+    try:
+        if args.command == 'import':
+            result = import_entries(storage, args.session, args.file, fmt,
+                                    progress=lambda n, r: print(f'{n} rows imported, {r} rejected', end='\r', file=sys.stderr))
+            print(f'Imported {result.imported} rows ({result.rejected} rejected) in {time.time() - started:.1f}s')
+            for reason, count in sorted(result.reasons.items()):
+                print(f'  {reason}: {count}')
+        else:
+            entries = storage.entries(args.session)
+            export_entries(entries, args.file, fmt)
+            print(f'Exported {len(entries)} rows to {args.file} in {time.time() - started:.1f}s')
+    finally:
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()